@@ -1,27 +1,113 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from pipelines.pdf_pipeline import process_pdf, get_supabase
+from starlette.concurrency import run_in_threadpool
+from pipelines.pdf_pipeline import save_upload, ingest_pdf, get_supabase
 from services.vector_service import delete_vectors_by_doc_id
+from services import content_cache
+from services.summary_service import invalidate_summary
+from services.job_queue import submit_job, get_job, get_batch, list_jobs, queue_full, QueueFullError
+from pipelines.batch_import import BatchError, stage_uploads, archive_members, resolve_import_path, queue_batch
+from pydantic import BaseModel
 import logging
+import os
+import uuid
 
 router = APIRouter()
 
+class ImportRequest(BaseModel):
+    path: str # Directory, zip archive or PDF, relative to IMPORT_ROOT
+    user_id: str
+
 @router.post("/upload")
 async def upload(file: UploadFile = File(...), user_id: str = Form(...)):
     """
     Upload a PDF file for processing.
+    Returns a job id immediately; poll /jobs/{job_id} for progress.
     """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    if queue_full():
+        # Don't spool a file that would be rejected anyway
+        raise HTTPException(status_code=429, detail="Ingest queue is full")
     
+    temp_file_path = None
     try:
-        # We'll just call it. process_pdf handles the reading from file.file
-        doc_id = process_pdf(file, user_id)
+        # Spool to disk off the event loop; the UploadFile is closed once we return
+        temp_file_path, content_hash = await run_in_threadpool(save_upload, file)
+        job_id = str(uuid.uuid4())
+        submit_job(
+            job_id, ingest_pdf, temp_file_path, file.filename, user_id, job_id, content_hash,
+            user_id=user_id, filename=file.filename
+        )
         
-        return {"status": "processed", "filename": file.filename, "document_id": doc_id}
+        return {"status": "queued", "filename": file.filename, "job_id": job_id}
+    except QueueFullError as e:
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
         logging.error(f"Error processing file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/upload/batch")
+async def upload_batch(files: list[UploadFile] = File(...), user_id: str = Form(...)):
+    """
+    Upload many PDFs, or zip archives of PDFs, in one request.
+    Every PDF becomes its own job; poll /batches/{batch_id} for per-file and overall progress.
+    """
+    try:
+        items = await run_in_threadpool(stage_uploads, files)
+        return await run_in_threadpool(queue_batch, items, user_id, "upload")
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error queueing batch upload: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/import")
+async def import_archive(request: ImportRequest):
+    """
+    Ingest a directory or zip archive of PDFs from the server's IMPORT_ROOT as one batch.
+    Files are read when their job starts; poll /batches/{batch_id} for progress.
+    """
+    try:
+        path = resolve_import_path(request.path)
+        items = await run_in_threadpool(archive_members, path)
+        return await run_in_threadpool(queue_batch, items, request.user_id, request.path)
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error queueing import of {request.path}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/batches/{batch_id}")
+def batch_status(batch_id: str):
+    """
+    Report per-file status and aggregate progress of a batch upload or import.
+    """
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"batch_id": batch_id, **batch}
+
+@router.get("/jobs")
+def user_jobs(user_id: str, limit: int = 50):
+    """
+    List a user's recent ingestion jobs, newest first.
+    """
+    return {"jobs": list_jobs(user_id, limit=limit)}
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    """
+    Report status and progress of an ingestion job.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, **job}
+
 @router.delete("/{doc_id}")
 async def delete_document(doc_id: str):
     """
@@ -40,11 +126,17 @@ async def delete_document(doc_id: str):
         job_id = doc.get("job_id")  # This is the Qdrant document_id
         storage_path = doc.get("storage_path")
         
-        # 1. Delete from Qdrant
+        # 1. Delete from Qdrant, unless another record shares the same vectors (deduplicated upload)
         if job_id:
             try:
-                print(f"Deleting vectors for job_id: {job_id}")
-                delete_vectors_by_doc_id(job_id)
+                shared = supabase.table("documents").select("id").eq("job_id", job_id).neq("id", doc_id).limit(1).execute()
+                if shared.data:
+                    print(f"Vectors for job_id {job_id} are still used by another document, keeping them")
+                else:
+                    print(f"Deleting vectors for job_id: {job_id}")
+                    delete_vectors_by_doc_id(job_id)
+                    content_cache.forget_document(job_id)
+                    invalidate_summary(job_id)
             except Exception as e:
                 logging.error(f"Failed to delete vectors: {e}")
                 # We continue to delete from DB
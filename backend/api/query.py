@@ -1,6 +1,15 @@
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from google.api_core.exceptions import ResourceExhausted
+from typing import Literal
 from pydantic import BaseModel
-from services.rag_service import answer_question
+from services.rag_service import (
+    answer_question, answer_question_async, stream_answer, check_scope, ScopeError, RATE_LIMIT_MESSAGE
+)
+from services.summary_service import get_document_summary
+from services.query_cache import cache_stats
 from pipelines.pdf_pipeline import get_supabase
 
 router = APIRouter()
@@ -8,34 +17,87 @@ router = APIRouter()
 class QueryRequest(BaseModel):
     question: str
     document_id: str | None = None
-    user_id: str | None = None # Added for saving history
+    user_id: str | None = None # Saves history and scopes retrieval to the user's library
+    document_ids: list[str] | None = None # Several documents at once (instead of document_id)
+    retrieval_mode: Literal["dense", "hybrid"] | None = None # Defaults to RETRIEVAL_MODE
 
-@router.post("/query")
-def query_endpoint(request: QueryRequest):
+def save_chat(user_id, document_id, question, answer):
+    """Store a question/answer pair in chat history; failures are logged, not raised."""
     supabase = get_supabase()
     try:
-        answer = answer_question(request.question, document_id=request.document_id)
+        data = {
+            "user_id": user_id,
+            "document_id": document_id,
+            "question": question,
+            "answer": answer
+        }
+        print(f"DEBUG: Inserting chat history: {data}")
+        supabase.table("chats").insert(data).execute()
+    except Exception as store_err:
+        print(f"Failed to store chat history: {store_err}")
+
+@router.post("/query")
+async def query_endpoint(request: QueryRequest):
+    try:
+        answer = await answer_question_async(
+            request.question, document_id=request.document_id, retrieval_mode=request.retrieval_mode,
+            user_id=request.user_id, document_ids=request.document_ids
+        )
         
         # Save chat history if user_id is provided
         if request.user_id:
-            try:
-                data = {
-                    "user_id": request.user_id,
-                    "document_id": request.document_id,
-                    "question": request.question,
-                    "answer": answer
-                }
-                print(f"DEBUG: Inserting chat history: {data}")
-                res = supabase.table("chats").insert(data).execute()
-            except Exception as store_err:
-                print(f"Failed to store chat history: {store_err}")
+            await asyncio.to_thread(save_chat, request.user_id, request.document_id, request.question, answer)
 
         return {"answer": answer}
+    except ScopeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
+    """
+    Stream the answer as server-sent events:
+    "data: {"token": ...}" per piece, then "event: done" with the full answer,
+    or "event: error" with a detail message (and "rate_limited": true when the
+    model's rate limit was hit; tokens already sent are then an incomplete answer).
+    """
+    try:
+        check_scope(request.document_id, request.user_id, request.document_ids)
+    except ScopeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        parts = []
+        try:
+            async for piece in stream_answer(
+                request.question, document_id=request.document_id, retrieval_mode=request.retrieval_mode,
+                user_id=request.user_id, document_ids=request.document_ids
+            ):
+                parts.append(piece)
+                yield f"data: {json.dumps({'token': piece})}\n\n"
+        except ResourceExhausted:
+            yield f"event: error\ndata: {json.dumps({'detail': RATE_LIMIT_MESSAGE, 'rate_limited': True})}\n\n"
+            return
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+
+        answer = "".join(parts)
+        if request.user_id:
+            await asyncio.to_thread(save_chat, request.user_id, request.document_id, request.question, answer)
+        yield f"event: done\ndata: {json.dumps({'answer': answer})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 class SummaryRequest(BaseModel):
     document_id: str | None = None
     user_id: str | None = None # Added for saving history
@@ -44,8 +106,15 @@ class SummaryRequest(BaseModel):
 def summary_endpoint(request: SummaryRequest = SummaryRequest()):
     supabase = get_supabase()
     try:
-        summary_prompt = "Provide a comprehensive summary of the provided document, highlighting the main topics, key findings, and conclusions."
-        answer = answer_question(summary_prompt, document_id=request.document_id)
+        if request.document_id:
+            # Stored per-document summary, built once
+            try:
+                answer = get_document_summary(request.document_id)
+            except ResourceExhausted:
+                answer = RATE_LIMIT_MESSAGE
+        else:
+            summary_prompt = "Provide a comprehensive summary of the provided document, highlighting the main topics, key findings, and conclusions."
+            answer = answer_question(summary_prompt, user_id=request.user_id)
 
         # Save summary history if user_id is provided
         if request.user_id:
@@ -62,7 +131,14 @@ def summary_endpoint(request: SummaryRequest = SummaryRequest()):
                 print(f"Failed to store summary history: {store_err}")
 
         return {"answer": answer}
+    except ScopeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache/stats")
+def cache_stats_endpoint():
+    return cache_stats()
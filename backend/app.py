@@ -1,11 +1,19 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.documents import router as documents_router
 from api.query import router as query_router
+from services.job_queue import recover_jobs
 import uvicorn
 import os
 
-app = FastAPI(title="OCR+RAG API", description="Backend for OCR and RAG services", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs and batches that died with a previous server process would stay queued forever
+    recover_jobs()
+    yield
+
+app = FastAPI(title="OCR+RAG API", description="Backend for OCR and RAG services", version="1.0.0", lifespan=lifespan)
 
 # Configure CORS - Allow all origins for production
 app.add_middleware(
@@ -18,3 +18,143 @@ QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+
+# Ingestion worker pool
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Max jobs waiting or running before /upload answers 429
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+# Batch uploads and imports: at most this many PDFs per batch. A batch is accepted as a
+# whole and fed to the ingest pool as queue slots free up, largest files first
+INGEST_BATCH_MAX_FILES = int(os.getenv("INGEST_BATCH_MAX_FILES", "500"))
+# Batch uploads: at most this many megabytes of PDFs per request, counting the PDFs inside
+# zip archives at their uncompressed size (checked before anything is extracted)
+INGEST_BATCH_MAX_MB = int(os.getenv("INGEST_BATCH_MAX_MB", "2048"))
+# Server directory that /import may read directories and zip archives from (empty disables it)
+IMPORT_ROOT = os.getenv("IMPORT_ROOT", "")
+
+# Job status store: "memory" (single process) or "sqlite" (shared across workers)
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(BASE_DIR, "jobs.db"))
+# Finished jobs are purged after this many seconds
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "86400"))
+
+# Content-addressed cache of Docling output, chunks and vectors keyed by PDF SHA-256
+CONTENT_CACHE_ENABLED = os.getenv("CONTENT_CACHE_ENABLED", "true").lower() == "true"
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+
+# Page-range parallel OCR: PDFs with at least OCR_PARALLEL_MIN_PAGES pages are split
+# into OCR_PAGES_PER_RANGE-page ranges converted on OCR_WORKERS processes (0 disables)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+OCR_PAGES_PER_RANGE = int(os.getenv("OCR_PAGES_PER_RANGE", "25"))
+OCR_PARALLEL_MIN_PAGES = int(os.getenv("OCR_PARALLEL_MIN_PAGES", "50"))
+
+# Adaptive OCR: pages with a usable embedded text layer skip OCR
+ADAPTIVE_OCR = os.getenv("ADAPTIVE_OCR", "true").lower() == "true"
+# Minimum extracted characters for a page's text layer to count as usable
+OCR_TEXT_MIN_CHARS = int(os.getenv("OCR_TEXT_MIN_CHARS", "50"))
+# Minimum share of readable characters; lower means garbled text (bad font maps)
+OCR_TEXT_MIN_QUALITY = float(os.getenv("OCR_TEXT_MIN_QUALITY", "0.85"))
+# Text-layer runs shorter than this between OCR pages are OCR'd with them
+OCR_MIN_TEXT_RUN = int(os.getenv("OCR_MIN_TEXT_RUN", "3"))
+
+# Streaming ingest: chunks per embed/upsert batch, and batches buffered between stages
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "4"))
+
+# Debug/archive mode: when set, each job's chapters are saved as <dir>/<job_id>.zip
+CHAPTER_ARCHIVE_DIR = os.getenv("CHAPTER_ARCHIVE_DIR", "")
+
+# Chunking, in the embedding model's word-pieces ([CLS]/[SEP] included).
+# all-MiniLM-L6-v2 reads at most 256 per input; anything past that is never embedded.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+# Tokens repeated at the start of the next chunk when a paragraph is split
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+# Chunk chapters on CHUNK_WORKERS processes (0 = serial) for documents with at least
+# CHUNK_PARALLEL_MIN_PAGES chapters
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "0"))
+CHUNK_PARALLEL_MIN_PAGES = int(os.getenv("CHUNK_PARALLEL_MIN_PAGES", "64"))
+
+# Embedding engine
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+# Upper bound on padded tokens per batch (batch rows x longest row)
+EMBED_MAX_BATCH_TOKENS = int(os.getenv("EMBED_MAX_BATCH_TOKENS", "8192"))
+# Torch intra-op threads for encoding (0 keeps the library default)
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+EMBED_NORMALIZE = os.getenv("EMBED_NORMALIZE", "false").lower() == "true"
+# Ingest jobs embed through one shared encoder; requests arriving within this many
+# milliseconds of each other are packed into the same length-bucketed batches
+EMBED_PACK_WAIT_MS = float(os.getenv("EMBED_PACK_WAIT_MS", "10"))
+
+# Embedding backend: "torch", "onnx" (fp32) or "onnx-int8" (dynamic int8 quantized)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+# Min cosine similarity vs. the torch model for an ONNX backend to be accepted
+EMBED_PARITY_THRESHOLD = float(os.getenv("EMBED_PARITY_THRESHOLD", "0.99"))
+# The check runs once per ONNX file and library versions; results are kept in CACHE_DIR
+EMBED_PARITY_CHECK = os.getenv("EMBED_PARITY_CHECK", "true").lower() == "true"
+
+# Query caches (per process): question -> vector, and (vector, document, k) -> points
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "3600"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+
+# Document summaries: built per chapter group then merged, stored in Supabase
+SUMMARY_PRECOMPUTE = os.getenv("SUMMARY_PRECOMPUTE", "false").lower() == "true"
+# Characters of chapter text sent per map-step LLM call
+SUMMARY_GROUP_CHARS = int(os.getenv("SUMMARY_GROUP_CHARS", "24000"))
+
+# LLM provider: "gemini" or "fake" (deterministic local stand-in for load tests)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Rate-limit retry backoff: attempt n waits n * this many seconds
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "2"))
+# Fake provider: time to first token, tokens per answer, streaming rate,
+# share of calls failing with ResourceExhausted, and RNG seed for those failures
+FAKE_LLM_LATENCY_MS = int(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "120"))
+FAKE_LLM_TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+# Context assembly: candidates fetched, MMR trade-off (1 = pure relevance),
+# near-duplicate cutoff (cosine), and prompt token budget per mode
+CONTEXT_CANDIDATES_CHAT = int(os.getenv("CONTEXT_CANDIDATES_CHAT", "16"))
+CONTEXT_CANDIDATES_SUMMARY = int(os.getenv("CONTEXT_CANDIDATES_SUMMARY", "48"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+CONTEXT_DUP_THRESHOLD = float(os.getenv("CONTEXT_DUP_THRESHOLD", "0.95"))
+CONTEXT_TOKENS_CHAT = int(os.getenv("CONTEXT_TOKENS_CHAT", "1500"))
+CONTEXT_TOKENS_SUMMARY = int(os.getenv("CONTEXT_TOKENS_SUMMARY", "6000"))
+
+# Retrieval: "dense" (vectors only) or "hybrid" (dense + BM25 sparse, fused with RRF)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# BM25 parameters for the sparse index (avg chunk length in terms)
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+BM25_AVG_DOC_LEN = float(os.getenv("BM25_AVG_DOC_LEN", "250"))
+
+# Vector store: "qdrant" (Qdrant Cloud) or "local" (in-process, memory-mapped, single box)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(BASE_DIR, "vector_store"))
+# Unscoped local searches switch from brute force to HNSW (needs hnswlib) above this many vectors
+LOCAL_HNSW_THRESHOLD = int(os.getenv("LOCAL_HNSW_THRESHOLD", "200000"))
+
+# Collection layout, applied when a collection is created (re-index to change an existing one).
+# int8 quantization keeps 1 byte per dimension in RAM; the float32 originals go to disk
+# and are only read to rescore the oversampled candidates.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "int8")  # "int8" or "none"
+QUANTIZATION_RESCORE = os.getenv("QUANTIZATION_RESCORE", "true").lower() == "true"
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", "2.0"))
+VECTORS_ON_DISK = os.getenv("VECTORS_ON_DISK", "true").lower() == "true"
+# HNSW graph: links per node, build-time beam width, per-query beam width
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCT = int(os.getenv("HNSW_EF_CONSTRUCT", "100"))
+HNSW_ON_DISK = os.getenv("HNSW_ON_DISK", "false").lower() == "true"
+# Extra links per tenant (user_id) so user-scoped searches stay on a dense subgraph.
+# With only user-scoped queries, HNSW_M=0 skips the global graph entirely.
+HNSW_PAYLOAD_M = int(os.getenv("HNSW_PAYLOAD_M", "16"))
+SEARCH_HNSW_EF = int(os.getenv("SEARCH_HNSW_EF", "128"))
+
+# Vector upserts: points per request, parallel upload workers, retries per batch
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+UPSERT_PARALLEL = int(os.getenv("UPSERT_PARALLEL", "1"))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "3"))
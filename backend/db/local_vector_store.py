@@ -0,0 +1,349 @@
+import fcntl
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+import numpy as np
+from config import LOCAL_HNSW_THRESHOLD, HNSW_M, HNSW_EF_CONSTRUCT, SEARCH_HNSW_EF
+from db.vector_store import VectorStore, scope_documents
+
+# In-process vector store for running on one box without Qdrant.
+# Layout under the store directory:
+#   vectors.f32  memory-mapped (capacity, dim) float32 matrix, rows L2-normalized
+#   points.db    SQLite (WAL): row -> point_id, document_id, user_id, payload, deleted flag
+# Rows are append-only; deletes only flag rows, so row numbers stay stable.
+# Every process holds a shared flock on <dir>.lock while the store is open; a re-index
+# swap takes it exclusively, so it waits for the other servers to exit, and servers
+# started during the swap wait for it to finish before opening the new files.
+
+INITIAL_CAPACITY = 1024
+
+@dataclass
+class LocalPoint:
+    id: int
+    score: float
+    payload: Dict[str, Any]
+    vector: Optional[list] = None
+
+
+class LocalVectorStore(VectorStore):
+    def __init__(self, path: str, dim: int = 384, hnsw_threshold: int = LOCAL_HNSW_THRESHOLD):
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.hnsw_threshold = hnsw_threshold
+        self._lock = threading.RLock()
+        self._process_lock = open(self.dir.with_name(self.dir.name + ".lock"), "a")
+        if not self._flock(fcntl.LOCK_SH):
+            print(f"⏸️ {self.dir} is being swapped by a re-index, waiting...")
+            fcntl.flock(self._process_lock, fcntl.LOCK_SH)
+        self._open()
+
+    # --- state -------------------------------------------------------------
+
+    def _open(self):
+        self.db = sqlite3.connect(self.dir / "points.db", check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS points (
+                row INTEGER PRIMARY KEY,
+                point_id TEXT,
+                document_id TEXT,
+                payload TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_points_document ON points (document_id, deleted);
+        """)
+        columns = {c[1] for c in self.db.execute("PRAGMA table_info(points)")}
+        if "point_id" not in columns:
+            self.db.execute("ALTER TABLE points ADD COLUMN point_id TEXT")
+        if "user_id" not in columns:
+            self.db.execute("ALTER TABLE points ADD COLUMN user_id TEXT")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_points_point_id ON points (point_id, deleted)")
+        self._load()
+
+    def _flock(self, mode) -> bool:
+        """Try to take the process lock in mode without waiting."""
+        try:
+            fcntl.flock(self._process_lock, mode | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _close(self):
+        self.matrix.flush()
+        del self.matrix
+        self.db.close()
+
+    def _load(self):
+        """(Re)build the in-memory indexes from SQLite and map the matrix."""
+        rows = self.db.execute("SELECT row, document_id, user_id, deleted FROM points ORDER BY row").fetchall()
+        self.count = rows[-1][0] + 1 if rows else 0
+        self.deleted = np.ones(self.count, dtype=bool)
+        by_doc = {}
+        by_user = {}
+        for row, document_id, user_id, deleted in rows:
+            if not deleted:
+                self.deleted[row] = False
+                by_doc.setdefault(document_id, []).append(row)
+                by_user.setdefault(user_id, []).append(row)
+        # Per-document and per-user row indexes for filtered search
+        self.doc_index = {doc: np.array(r, dtype=np.int64) for doc, r in by_doc.items()}
+        self.user_index = {user: np.array(r, dtype=np.int64) for user, r in by_user.items()}
+        self._map(max(self.count, INITIAL_CAPACITY))
+        self._hnsw = None
+        self._data_version = self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _map(self, capacity: int):
+        path = self.dir / "vectors.f32"
+        needed = capacity * self.dim * 4
+        if not path.exists() or path.stat().st_size < needed:
+            with open(path, "ab") as f:
+                f.truncate(needed)
+        self.matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def _refresh(self):
+        # data_version changes when another process committed to points.db
+        version = self.db.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._load()
+
+    # --- HNSW (optional, unscoped queries on large collections) -------------
+
+    def _hnsw_index(self):
+        live = self.count - int(self.deleted.sum())
+        if live < self.hnsw_threshold:
+            return None
+        if self._hnsw is None:
+            try:
+                import hnswlib
+            except ImportError:
+                return None
+            print(f"🔄 Building HNSW index over {live} vectors...")
+            index = hnswlib.Index(space="ip", dim=self.dim)
+            index.init_index(max_elements=self.capacity, ef_construction=HNSW_EF_CONSTRUCT, M=HNSW_M)
+            labels = np.flatnonzero(~self.deleted)
+            index.add_items(self.matrix[labels], labels)
+            index.set_ef(SEARCH_HNSW_EF)
+            self._hnsw = index
+        return self._hnsw
+
+    # --- VectorStore --------------------------------------------------------
+
+    def upsert(self, ids, vectors, payloads, skip_existing=False):
+        array = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        array = array / np.maximum(np.linalg.norm(array, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            # The SQLite write lock also guards the matrix: rows are only picked and
+            # written while it is held, so processes sharing the directory never
+            # write to the same rows
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                existing = {}
+                for i in range(0, len(ids), 500):
+                    batch = ids[i:i + 500]
+                    placeholders = ",".join("?" for _ in batch)
+                    existing.update((r[1], r[0]) for r in self.db.execute(
+                        f"SELECT row, point_id FROM points WHERE deleted = 0 AND point_id IN ({placeholders})", batch
+                    ))
+                replaced = np.empty(0, dtype=np.int64)
+                if skip_existing:
+                    keep = [i for i, pid in enumerate(ids) if pid not in existing]
+                    if not keep:
+                        self.db.execute("ROLLBACK")
+                        return 0
+                    ids = [ids[i] for i in keep]
+                    array = array[keep]
+                    payloads = [payloads[i] for i in keep]
+                elif existing:
+                    # Same id, new payload: the old rows are dropped like deleted points
+                    replaced = np.fromiter(existing.values(), dtype=np.int64, count=len(existing))
+                    self.db.executemany("UPDATE points SET deleted = 1 WHERE row = ?", [(int(r),) for r in replaced])
+                n = len(array)
+
+                last = self.db.execute("SELECT MAX(row) FROM points").fetchone()[0]
+                start = max(self.count, last + 1 if last is not None else 0)
+                if start + n > self.capacity:
+                    self.matrix.flush()
+                    self._map(max(start + n, self.capacity * 2))
+                    if self._hnsw is not None:
+                        self._hnsw.resize_index(self.capacity)
+                self.matrix[start:start + n] = array
+                self.matrix.flush()
+
+                self.db.executemany(
+                    "INSERT INTO points (row, point_id, document_id, user_id, payload) VALUES (?, ?, ?, ?, ?)",
+                    [(start + i, ids[i], p.get("document_id"), p.get("user_id"), json.dumps(p)) for i, p in enumerate(payloads)]
+                )
+                self.db.execute("COMMIT")
+            except Exception:
+                if self.db.in_transaction:
+                    self.db.execute("ROLLBACK")
+                raise
+            # Our own commit does not change data_version: record the new rows in memory
+            if len(replaced):
+                self._forget_rows(replaced)
+            if start > self.count:
+                self.deleted = np.concatenate([self.deleted, np.ones(start - self.count, dtype=bool)])
+            self.count = start + n
+            self.deleted = np.concatenate([self.deleted, np.zeros(n, dtype=bool)])
+            for index, field in ((self.doc_index, "document_id"), (self.user_index, "user_id")):
+                new_rows = {}
+                for i, p in enumerate(payloads):
+                    new_rows.setdefault(p.get(field), []).append(start + i)
+                for key, rows in new_rows.items():
+                    current = index.get(key, np.empty(0, dtype=np.int64))
+                    index[key] = np.concatenate([current, np.array(rows, dtype=np.int64)])
+            if self._hnsw is not None:
+                self._hnsw.add_items(array, np.arange(start, start + n))
+            return n
+
+    def _scoped_rows(self, document_ids, user_id):
+        empty = np.empty(0, dtype=np.int64)
+        rows = None
+        if document_ids:
+            rows = np.concatenate([self.doc_index.get(doc, empty) for doc in document_ids])
+        if user_id:
+            user_rows = self.user_index.get(user_id, empty)
+            if rows is not None:
+                # Rows stored before user_id was recorded match when their document is named
+                user_rows = np.concatenate([user_rows, self.user_index.get(None, empty)])
+            rows = user_rows if rows is None else np.intersect1d(rows, user_rows)
+        return rows
+
+    def search(self, query_vector, k=4, document_id=None, with_vectors=False, mode="dense", query_text=None,
+               document_ids=None, user_id=None):
+        # Lexical fusion needs Qdrant's sparse index; the local backend ranks by vectors only
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        with self._lock:
+            self._refresh()
+            rows = self._scoped_rows(scope_documents(document_id, document_ids), user_id)
+            if rows is not None:
+                scores = self.matrix[rows] @ q
+            else:
+                index = self._hnsw_index()
+                if index is not None:
+                    # hnswlib needs a beam at least as wide as k
+                    index.set_ef(max(SEARCH_HNSW_EF, k))
+                    labels, distances = index.knn_query(q, k=min(k, self.count - int(self.deleted.sum())))
+                    rows, scores = labels[0].astype(np.int64), 1.0 - distances[0]
+                else:
+                    rows = np.arange(self.count)
+                    scores = self.matrix[:self.count] @ q
+                    scores[self.deleted] = -np.inf
+
+            if len(rows) == 0:
+                return []
+            top = min(k, len(rows))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            best = [b for b in best if np.isfinite(scores[b])]
+            selected = [int(rows[b]) for b in best]
+
+            placeholders = ",".join("?" for _ in selected)
+            payloads = dict(self.db.execute(
+                f"SELECT row, payload FROM points WHERE row IN ({placeholders})", selected
+            ).fetchall()) if selected else {}
+
+            return [
+                LocalPoint(
+                    id=row,
+                    score=float(scores[b]),
+                    payload=json.loads(payloads[row]),
+                    vector=self.matrix[row].tolist() if with_vectors else None
+                )
+                for row, b in zip(selected, best)
+            ]
+
+    def delete_document(self, document_id):
+        with self._lock:
+            self._refresh()
+            self.db.execute("UPDATE points SET deleted = 1 WHERE document_id = ?", (document_id,))
+            self._forget_rows(self.doc_index.get(document_id, np.empty(0, dtype=np.int64)))
+
+    def _forget_rows(self, rows):
+        """Drop rows marked deleted in points.db from the in-memory indexes."""
+        self.deleted[rows] = True
+        for index in (self.doc_index, self.user_index):
+            for key, key_rows in list(index.items()):
+                remaining = key_rows[~self.deleted[key_rows]]
+                if len(remaining):
+                    index[key] = remaining
+                else:
+                    del index[key]
+        if self._hnsw is not None:
+            for row in rows:
+                self._hnsw.mark_deleted(int(row))
+
+    def set_keywords(self, ids, texts, keywords):
+        # Payloads are read from points.db at query time, so nothing is cached in memory
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany(
+                    "UPDATE points SET payload = json_set(payload, '$.keywords', json(?)) WHERE point_id = ? AND deleted = 0",
+                    [(json.dumps(words), pid) for pid, words in zip(ids, keywords)]
+                )
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def scroll_document(self, document_id, with_vectors=False):
+        with self._lock:
+            self._refresh()
+            rows = self.db.execute(
+                "SELECT row, payload FROM points WHERE document_id = ? AND deleted = 0 ORDER BY row",
+                (document_id,)
+            ).fetchall()
+            vectors = self.matrix[[r[0] for r in rows]] if with_vectors and rows else None
+        for i, (row, payload) in enumerate(rows):
+            vector = vectors[i].tolist() if vectors is not None else None
+            yield LocalPoint(id=row, score=0.0, payload=json.loads(payload), vector=vector)
+
+    def count_document(self, document_id):
+        with self._lock:
+            self._refresh()
+            return len(self.doc_index.get(document_id, ()))
+
+    def document_ids(self):
+        with self._lock:
+            self._refresh()
+            return sorted(doc for doc in self.doc_index if doc is not None)
+
+    def create_shadow(self):
+        path = self.dir.with_name(self.dir.name + ".shadow")
+        shutil.rmtree(path, ignore_errors=True)
+        return LocalVectorStore(str(path), dim=self.dim, hnsw_threshold=self.hnsw_threshold)
+
+    def swap_in(self, shadow, reconcile=None):
+        # Renaming the directory under other processes would lose what they write
+        # next, so wait until this is the only one with the store open
+        with self._lock:
+            if not self._flock(fcntl.LOCK_EX):
+                print(f"⏸️ Waiting for every other process using {self.dir} to exit. "
+                      f"Stop the API servers now and start them again once the swap is done.")
+                fcntl.flock(self._process_lock, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                if reconcile is not None:
+                    reconcile(self)
+                shadow._close()
+                self._close()
+                old = self.dir.with_name(self.dir.name + ".old")
+                shutil.rmtree(old, ignore_errors=True)
+                os.replace(self.dir, old)
+                os.replace(shadow.dir, self.dir)
+                shutil.rmtree(old, ignore_errors=True)
+                self._open()
+            finally:
+                fcntl.flock(self._process_lock, fcntl.LOCK_SH)
+            shadow._process_lock.close()
+            os.remove(shadow._process_lock.name)
@@ -1,9 +1,17 @@
 import os
+import time
 from qdrant_client import QdrantClient
+from config import (
+    VECTOR_QUANTIZATION, QUANTIZATION_RESCORE, QUANTIZATION_OVERSAMPLING, VECTORS_ON_DISK,
+    HNSW_M, HNSW_EF_CONSTRUCT, HNSW_ON_DISK, HNSW_PAYLOAD_M, SEARCH_HNSW_EF
+)
 
 # Client for the Vector Database
 COLLECTION = "docs"
+# Named sparse vector holding BM25 term weights (hybrid retrieval)
+SPARSE_VECTOR = "text"
 _client = None
+_has_sparse = {}
 
 def get_vector_client():
     global _client
@@ -21,23 +29,19 @@ def get_vector_client():
     # Helper to ensure collection exists (Run once)
     try:
         collections = _client.get_collections().collections
-        if not any(c.name == COLLECTION for c in collections):
+        aliases = _client.get_aliases().aliases
+        # COLLECTION is an alias onto the live collection, so a re-index can swap it atomically
+        if not any(c.name == COLLECTION for c in collections) and not any(a.alias_name == COLLECTION for a in aliases):
             from qdrant_client import models
-            _client.create_collection(
-                collection_name=COLLECTION,
-                vectors_config=models.VectorParams(size=384, distance=models.Distance.COSINE)
-            )
-            print(f"Created collection '{COLLECTION}'")
-            
-            # Ensure payload index exists for filtering
-            _client.create_payload_index(
-                collection_name=COLLECTION,
-                field_name="document_id",
-                field_schema="keyword"
-            )
-            print(f"Verified index for 'document_id' in '{COLLECTION}'")
+            physical = physical_name()
+            create_collection(_client, physical)
+            _client.update_collection_aliases(change_aliases_operations=[models.CreateAliasOperation(
+                create_alias=models.CreateAlias(collection_name=physical, alias_name=COLLECTION)
+            )])
         else:
             print(f"Connected to collection '{COLLECTION}'")
+            check_dimension(_client)
+            ensure_payload_indexes(_client)
         
     except Exception as e:
         print(f"Error checking/creating collection: {e}")
@@ -47,3 +51,188 @@ def get_vector_client():
         
     return _client
 
+
+def physical_name(base=COLLECTION):
+    """Name for a new physical collection behind the COLLECTION alias."""
+    return f"{base}_{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def create_collection(client, name):
+    from qdrant_client import models
+    from services.embedding_service import embedding_dimension
+    quantization = None
+    if VECTOR_QUANTIZATION == "int8":
+        quantization = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+    elif VECTOR_QUANTIZATION != "none":
+        raise ValueError(f"Unknown VECTOR_QUANTIZATION '{VECTOR_QUANTIZATION}': use 'int8' or 'none'")
+
+    client.create_collection(
+        collection_name=name,
+        vectors_config=models.VectorParams(
+            size=embedding_dimension(),
+            distance=models.Distance.COSINE,
+            on_disk=VECTORS_ON_DISK
+        ),
+        sparse_vectors_config={
+            SPARSE_VECTOR: models.SparseVectorParams(modifier=models.Modifier.IDF)
+        },
+        hnsw_config=models.HnswConfigDiff(
+            m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT, on_disk=HNSW_ON_DISK, payload_m=HNSW_PAYLOAD_M
+        ),
+        quantization_config=quantization
+    )
+    print(f"Created collection '{name}' (quantization={VECTOR_QUANTIZATION}, on_disk={VECTORS_ON_DISK}, m={HNSW_M})")
+    ensure_payload_indexes(client, name)
+
+
+def ensure_payload_indexes(client, name=COLLECTION):
+    """Keyword indexes for scoped search; user_id is the tenant key, so its points are stored together."""
+    from qdrant_client import models
+    existing = client.get_collection(resolve_collection(name)).payload_schema or {}
+    indexes = {
+        "document_id": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD),
+        "user_id": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    }
+    for field, schema in indexes.items():
+        if field in existing:
+            continue
+        client.create_payload_index(collection_name=name, field_name=field, field_schema=schema)
+        print(f"Created index for '{field}' in '{name}'")
+
+
+def check_dimension(client, name=COLLECTION):
+    """Warn when the collection was built for a different embedding model."""
+    from services.embedding_service import embedding_dimension
+    params = client.get_collection(resolve_collection(name)).config.params.vectors
+    size = params.size if hasattr(params, "size") else params[""].size
+    if size != embedding_dimension():
+        print(f"⚠️ Collection '{name}' holds {size}-dim vectors but the model produces "
+              f"{embedding_dimension()}; run pipelines/reindex.py")
+
+
+def search_params(exact=False, hnsw_ef=SEARCH_HNSW_EF, rescore=QUANTIZATION_RESCORE):
+    """Per-query HNSW beam width and quantization rescoring."""
+    from qdrant_client import models
+    quantization = None
+    if exact:
+        # Ground truth: full-precision vectors only
+        quantization = models.QuantizationSearchParams(ignore=True)
+    elif VECTOR_QUANTIZATION != "none":
+        quantization = models.QuantizationSearchParams(
+            rescore=rescore,
+            oversampling=QUANTIZATION_OVERSAMPLING if rescore else None
+        )
+    return models.SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
+
+def resolve_collection(name=COLLECTION):
+    """Physical collection behind name, which may be an alias."""
+    for alias in get_vector_client().get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return name
+
+
+def swap_collection(new_name, reconcile=None):
+    """
+    Point COLLECTION at new_name in one alias update and drop the collection it replaced.
+    reconcile(old_name), when given, runs once writes no longer reach the old collection,
+    before it is dropped.
+
+    Stores created before COLLECTION became an alias hold the name as a physical
+    collection. Qdrant cannot rename a collection nor give an alias a collection's
+    name, so that first swap deletes it (after reconcile, new_name holds all of its
+    data) and then creates the alias: requests in between fail. If the alias cannot
+    be created, new_name is left intact and the error says so.
+    """
+    from qdrant_client import models
+    client = get_vector_client()
+    current = resolve_collection()
+    create = models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=new_name, alias_name=COLLECTION)
+    )
+    if current != COLLECTION:
+        client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=COLLECTION)),
+            create
+        ])
+        if reconcile is not None:
+            reconcile(current)
+    else:
+        if reconcile is not None:
+            reconcile(current)
+        client.delete_collection(COLLECTION)
+        for attempt in range(3):
+            try:
+                client.update_collection_aliases(change_aliases_operations=[create])
+                break
+            except Exception as e:
+                if attempt == 2:
+                    raise RuntimeError(
+                        f"'{COLLECTION}' was dropped but the alias onto '{new_name}' could not be created; "
+                        f"all data is in '{new_name}', create the alias by hand: {e}"
+                    ) from e
+                time.sleep(2 ** attempt)
+    if current != COLLECTION:
+        client.delete_collection(current)
+    _has_sparse.clear()
+    print(f"Alias '{COLLECTION}' now points at '{new_name}'")
+
+
+def has_sparse_vectors(name=COLLECTION):
+    """True when the collection was created with the BM25 sparse vector (hybrid retrieval)."""
+    if name not in _has_sparse:
+        info = get_vector_client().get_collection(resolve_collection(name))
+        sparse = info.config.params.sparse_vectors or {}
+        _has_sparse[name] = SPARSE_VECTOR in sparse
+        if not _has_sparse[name]:
+            print(f"Collection '{name}' has no '{SPARSE_VECTOR}' sparse vector; hybrid retrieval falls back to dense")
+    return _has_sparse[name]
+
+
+if __name__ == "__main__":
+    # Recall/latency of approximate search against exact search, plus a memory estimate.
+    # Run from backend/: python -m db.vector_client
+    import numpy as np
+
+    client = get_vector_client()
+    name = resolve_collection()
+    info = client.get_collection(name)
+    params = info.config.params.vectors
+    dim = params.size if hasattr(params, "size") else params[""].size
+    count = info.points_count or 0
+    mib = 2 ** 20
+    graph = count * HNSW_M * 2 * 4
+    print(f"'{name}': {count} points x {dim} dims")
+    print(f"  RAM, float32 vectors in memory: {(count * dim * 4 + graph) / mib:.1f} MiB")
+    print(f"  RAM, int8 quantized (originals on disk): {(count * dim + graph) / mib:.1f} MiB")
+
+    sample, _ = client.scroll(collection_name=COLLECTION, limit=100, with_payload=False, with_vectors=True)
+    queries = [p.vector.get("") if isinstance(p.vector, dict) else p.vector for p in sample]
+    if not queries:
+        raise SystemExit("Collection is empty")
+
+    k = 10
+    def run(params):
+        ids, times = [], []
+        for q in queries:
+            start = time.perf_counter()
+            points = client.query_points(collection_name=COLLECTION, query=q, limit=k, search_params=params).points
+            times.append(time.perf_counter() - start)
+            ids.append({p.id for p in points})
+        return ids, np.array(times) * 1000
+
+    truth, exact_ms = run(search_params(exact=True))
+    print(f"exact:                   p50 {np.median(exact_ms):6.1f} ms")
+    for ef in (16, 32, 64, 128, 256):
+        for rescore in (False, True):
+            ids, ms = run(search_params(hnsw_ef=ef, rescore=rescore))
+            recall = sum(len(a & b) for a, b in zip(ids, truth)) / sum(len(b) for b in truth)
+            print(f"ef={ef:<4} rescore={str(rescore):<5}: recall@{k} {recall:.3f}, "
+                  f"p50 {np.median(ms):6.1f} ms, p95 {np.percentile(ms, 95):6.1f} ms")
@@ -0,0 +1,292 @@
+import threading
+from abc import ABC, abstractmethod
+from config import VECTOR_BACKEND, LOCAL_VECTOR_DIR, UPSERT_BATCH_SIZE, UPSERT_PARALLEL, UPSERT_MAX_RETRIES
+
+class VectorStore(ABC):
+    """
+    Interface behind services.vector_service.
+    Search results expose .id, .score, .payload and .vector (dense, or None).
+    """
+
+    @abstractmethod
+    def upsert(self, ids, vectors, payloads, skip_existing=False) -> int:
+        """
+        Insert points under deterministic ids (same id means same document, position
+        and content), replacing stored points with the same id so their payload is
+        refreshed. With skip_existing, ids already stored are left as they are, at the
+        cost of looking them up first. Returns the number written.
+        """
+
+    @abstractmethod
+    def search(self, query_vector, k=4, document_id=None, with_vectors=False, mode="dense", query_text=None,
+               document_ids=None, user_id=None):
+        """
+        Nearest points, scoped to document_id or any of document_ids, and/or to one user's library.
+        Points without a user_id (stored before it was in the payload) only match document-scoped
+        queries. With no scope at all every stored point is a candidate; callers serving a
+        request must scope it (see rag_service.check_scope).
+        """
+
+    @abstractmethod
+    def set_keywords(self, ids, texts, keywords):
+        """
+        Replace the keywords of stored points (and the sparse vectors built from
+        them, where the store keeps any). Vectors and the rest of the payload stay.
+        """
+
+    @abstractmethod
+    def delete_document(self, document_id):
+        """Remove every point of a document."""
+
+    @abstractmethod
+    def scroll_document(self, document_id, with_vectors=False):
+        """Yield every stored point of a document (payload, plus the dense vector if asked)."""
+
+    @abstractmethod
+    def document_ids(self) -> list:
+        """Ids of every document with stored points."""
+
+    @abstractmethod
+    def count_document(self, document_id) -> int:
+        """Number of stored points of a document."""
+
+    # --- re-indexing (pipelines/reindex.py) ---------------------------------
+
+    @abstractmethod
+    def create_shadow(self) -> "VectorStore":
+        """Empty store with the same configuration, filled before swap_in."""
+
+    @abstractmethod
+    def swap_in(self, shadow: "VectorStore", reconcile=None):
+        """
+        Make shadow's contents the live data, replacing this store's.
+        reconcile(old), when given, is called with a store over the old data once no
+        more writes can reach it, so writes that landed after the copy can be carried over.
+        """
+
+
+def _document_filter(document_id):
+    from qdrant_client import models
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key="document_id",
+                match=models.MatchValue(value=document_id)
+            )
+        ]
+    )
+
+def _scope_filter(document_ids=None, user_id=None):
+    from qdrant_client import models
+    must = []
+    owner = models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id)) if user_id else None
+    if document_ids:
+        must.append(models.FieldCondition(key="document_id", match=models.MatchAny(any=list(document_ids))))
+        if owner:
+            # Points stored before user_id was in the payload still match a query that names their document
+            must.append(models.Filter(should=[
+                owner,
+                models.IsEmptyCondition(is_empty=models.PayloadField(key="user_id"))
+            ]))
+    elif owner:
+        must.append(owner)
+    return models.Filter(must=must) if must else None
+
+def scope_documents(document_id=None, document_ids=None):
+    """Single id and id list as one list (None = no document scope)."""
+    if document_id:
+        return [document_id]
+    return list(document_ids) if document_ids else None
+
+
+class QdrantVectorStore(VectorStore):
+    def __init__(self, collection=None):
+        from db.vector_client import get_vector_client, COLLECTION
+        self.client = get_vector_client()
+        self.collection = collection or COLLECTION
+
+    def existing_ids(self, ids) -> set:
+        found = set()
+        for i in range(0, len(ids), UPSERT_BATCH_SIZE):
+            points = self.client.retrieve(
+                collection_name=self.collection,
+                ids=ids[i:i + UPSERT_BATCH_SIZE],
+                with_payload=False,
+                with_vectors=False
+            )
+            found.update(str(p.id) for p in points)
+        return found
+
+    def upsert(self, ids, vectors, payloads, skip_existing=False):
+        from db.vector_client import has_sparse_vectors, SPARSE_VECTOR
+        if skip_existing:
+            existing = self.existing_ids(ids)
+            keep = [i for i, pid in enumerate(ids) if pid not in existing]
+            if not keep:
+                return 0
+            ids = [ids[i] for i in keep]
+            vectors = [vectors[i] for i in keep]
+            payloads = [payloads[i] for i in keep]
+
+        if has_sparse_vectors(self.collection):
+            from services.sparse_service import encode_document
+            # Dense vector under the default (unnamed) slot, BM25 weights alongside
+            vectors = [
+                {"": [float(x) for x in vec], SPARSE_VECTOR: encode_document(p["text"], p.get("keywords") or ())}
+                for vec, p in zip(vectors, payloads)
+            ]
+            
+        # wait=True: a batch counts as committed only once Qdrant applied it
+        self.client.upload_collection(
+            collection_name=self.collection,
+            ids=ids,
+            vectors=vectors,
+            payload=payloads,
+            batch_size=UPSERT_BATCH_SIZE,
+            parallel=UPSERT_PARALLEL,
+            max_retries=UPSERT_MAX_RETRIES,
+            wait=True
+        )
+        return len(ids)
+
+    def set_keywords(self, ids, texts, keywords):
+        from qdrant_client import models
+        from db.vector_client import has_sparse_vectors, SPARSE_VECTOR
+        sparse = has_sparse_vectors(self.collection)
+        if sparse:
+            from services.sparse_service import encode_document
+        for i in range(0, len(ids), UPSERT_BATCH_SIZE):
+            operations = []
+            for pid, text, words in zip(ids[i:i + UPSERT_BATCH_SIZE], texts[i:i + UPSERT_BATCH_SIZE],
+                                        keywords[i:i + UPSERT_BATCH_SIZE]):
+                operations.append(models.SetPayloadOperation(
+                    set_payload=models.SetPayload(payload={"keywords": words}, points=[pid])
+                ))
+                if sparse:
+                    operations.append(models.UpdateVectorsOperation(update_vectors=models.UpdateVectors(
+                        points=[models.PointVectors(id=pid, vector={SPARSE_VECTOR: encode_document(text, words)})]
+                    )))
+            self.client.batch_update_points(collection_name=self.collection, update_operations=operations, wait=True)
+
+    def search(self, query_vector, k=4, document_id=None, with_vectors=False, mode="dense", query_text=None,
+               document_ids=None, user_id=None):
+        from qdrant_client import models
+        from db.vector_client import has_sparse_vectors, search_params, SPARSE_VECTOR
+        query_filter = _scope_filter(scope_documents(document_id, document_ids), user_id)
+        dense_query = [float(x) for x in query_vector]
+        params = search_params()
+
+        if mode == "hybrid" and query_text and has_sparse_vectors(self.collection):
+            from services.sparse_service import encode_query
+            # Each branch over-fetches so fusion has overlap to work with
+            result = self.client.query_points(
+                collection_name=self.collection,
+                prefetch=[
+                    models.Prefetch(query=dense_query, filter=query_filter, params=params, limit=k * 2),
+                    models.Prefetch(query=encode_query(query_text), using=SPARSE_VECTOR, filter=query_filter, limit=k * 2),
+                ],
+                query=models.FusionQuery(fusion=models.Fusion.RRF),
+                query_filter=query_filter,
+                limit=k,
+                with_vectors=with_vectors
+            )
+        else:
+            # Using query_points (Universal Query) as client.search seems unavailable
+            result = self.client.query_points(
+                collection_name=self.collection,
+                query=dense_query,
+                query_filter=query_filter,
+                search_params=params,
+                limit=k,
+                with_vectors=with_vectors
+            )
+        points = result.points
+        for p in points:
+            # Named-vector collections return {"": dense, ...}; expose the dense one
+            if isinstance(p.vector, dict):
+                p.vector = p.vector.get("")
+        return points
+
+    def delete_document(self, document_id):
+        from qdrant_client import models
+        self.client.delete(
+            collection_name=self.collection,
+            points_selector=models.FilterSelector(filter=_document_filter(document_id))
+        )
+
+    def scroll_document(self, document_id, with_vectors=False, batch_size=256):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=_document_filter(document_id),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors
+            )
+            for p in points:
+                if isinstance(p.vector, dict):
+                    p.vector = p.vector.get("")
+            yield from points
+            if offset is None:
+                break
+
+    def document_ids(self, batch_size=1024):
+        found = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=["document_id"],
+                with_vectors=False
+            )
+            found.update(p.payload.get("document_id") for p in points)
+            if offset is None:
+                break
+        found.discard(None)
+        return sorted(found)
+
+    def create_shadow(self):
+        from db.vector_client import create_collection, physical_name
+        name = physical_name(self.collection)
+        create_collection(self.client, name)
+        return QdrantVectorStore(name)
+
+    def count_document(self, document_id):
+        return self.client.count(
+            collection_name=self.collection,
+            count_filter=_document_filter(document_id),
+            exact=True
+        ).count
+
+    def swap_in(self, shadow, reconcile=None):
+        from db.vector_client import swap_collection
+        # Readers and writers keep addressing self.collection, which becomes an alias:
+        # once it moves, writes from every server land in shadow's collection
+        swap_collection(
+            shadow.collection,
+            reconcile=(lambda old: reconcile(QdrantVectorStore(old))) if reconcile is not None else None
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_vector_store() -> VectorStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if VECTOR_BACKEND == "qdrant":
+                    _store = QdrantVectorStore()
+                elif VECTOR_BACKEND == "local":
+                    from db.local_vector_store import LocalVectorStore
+                    from services.embedding_service import embedding_dimension
+                    print(f"🔄 Using local vector store at {LOCAL_VECTOR_DIR}")
+                    _store = LocalVectorStore(LOCAL_VECTOR_DIR, dim=embedding_dimension())
+                else:
+                    raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}': use 'qdrant' or 'local'")
+    return _store
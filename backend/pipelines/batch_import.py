@@ -0,0 +1,198 @@
+import sys
+import os
+
+# Add the backend directory to sys.path so this runs as a script too
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+import uuid
+import zipfile
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from config import IMPORT_ROOT, INGEST_BATCH_MAX_FILES, INGEST_BATCH_MAX_MB, ADAPTIVE_OCR
+from pipelines.pdf_pipeline import save_upload, ingest_pdf
+from services.job_queue import submit_batch, get_batch
+
+# Batch ingestion: many PDFs uploaded in one request, or a directory / zip archive
+# already on the server. Every PDF becomes an ordinary ingest job with its own
+# progress, grouped under a batch record (see job_queue.submit_batch):
+#   - models are loaded once, before the first job starts
+#   - files are started largest first, so small ones fill the pool at the end
+#   - jobs embed through the shared packed encoder (embedding_service.embed_packed)
+# Usage (from backend/): python -m pipelines.batch_import PATH --user-id USER [--sequential]
+
+class BatchError(Exception):
+    """Raised when a batch cannot be accepted (no PDFs, too many files, bad path)."""
+    pass
+
+def is_pdf(name: str) -> bool:
+    return name.lower().endswith(".pdf")
+
+@contextmanager
+def open_zip_member(zip_path, name):
+    with zipfile.ZipFile(zip_path) as archive, archive.open(name) as member:
+        yield member
+
+def archive_members(path) -> list[tuple[str, int, object]]:
+    """
+    PDFs in a directory (recursively), a zip archive, or a single PDF,
+    as (filename, size, opener) with opener() returning a binary file object.
+    Filenames are relative to the directory or archive.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(p for p in path.rglob("*") if p.is_file() and is_pdf(p.name))
+        return [(p.relative_to(path).as_posix(), p.stat().st_size, partial(open, p, "rb")) for p in files]
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            infos = [
+                info for info in archive.infolist()
+                if not info.is_dir() and is_pdf(info.filename) and not info.filename.startswith("__MACOSX/")
+            ]
+        return [(info.filename, info.file_size, partial(open_zip_member, path, info.filename)) for info in infos]
+    if path.is_file() and is_pdf(path.name):
+        return [(path.name, path.stat().st_size, partial(open, path, "rb"))]
+    raise BatchError(f"{path.name} is not a directory, zip archive or PDF")
+
+def resolve_import_path(path: str) -> Path:
+    """Resolve a client-given path inside IMPORT_ROOT."""
+    if not IMPORT_ROOT:
+        raise BatchError("Server-side import is disabled (IMPORT_ROOT is not set)")
+    root = Path(IMPORT_ROOT).resolve()
+    target = (root / path).resolve()
+    if target != root and root not in target.parents:
+        raise BatchError("Path is outside IMPORT_ROOT")
+    if not target.exists():
+        raise BatchError(f"{path} not found")
+    return target
+
+def check_batch_size(files: int, size: int):
+    if files > INGEST_BATCH_MAX_FILES:
+        raise BatchError(f"Too many files ({files}, at most {INGEST_BATCH_MAX_FILES} per batch)")
+    if size > INGEST_BATCH_MAX_MB * 2**20:
+        raise BatchError(f"Batch too large ({size / 2**20:.0f} MB, at most {INGEST_BATCH_MAX_MB} MB)")
+
+def stage_uploads(files) -> list[tuple[str, int, tuple[str, str]]]:
+    """
+    Save uploaded PDFs, and the PDFs inside uploaded zip archives, to temp files.
+    Zip members are counted against INGEST_BATCH_MAX_FILES and INGEST_BATCH_MAX_MB at
+    their declared size before any is extracted (zipfile never inflates past it).
+    Returns (filename, size, (temp_file_path, content_hash)) items; on error nothing is left behind.
+    """
+    items = []
+    size = 0
+    try:
+        for file in files:
+            if is_pdf(file.filename):
+                temp_file_path, content_hash = save_upload(file)
+                items.append((file.filename, os.path.getsize(temp_file_path), (temp_file_path, content_hash)))
+                size += items[-1][1]
+                check_batch_size(len(items), size)
+            elif file.filename.lower().endswith(".zip"):
+                zip_path, _ = save_upload(file)
+                try:
+                    if not zipfile.is_zipfile(zip_path):
+                        raise BatchError(f"{file.filename} is not a valid zip archive")
+                    members = archive_members(zip_path)
+                    size += sum(member_size for _, member_size, _ in members)
+                    check_batch_size(len(items) + len(members), size)
+                    for name, member_size, opener in members:
+                        with opener() as member:
+                            items.append((name, member_size, save_upload(member)))
+                finally:
+                    os.remove(zip_path)
+            else:
+                raise BatchError(f"{file.filename}: only PDF and zip files are allowed")
+    except Exception:
+        discard(items)
+        raise
+    return items
+
+def discard(items):
+    for _, _, source in items:
+        if isinstance(source, tuple) and os.path.exists(source[0]):
+            os.remove(source[0])
+
+def ingest_member(opener, filename: str, user_id: str, job_id: str):
+    """Copy one file of an import to a temp file, hashing it on the way, and ingest it."""
+    with opener() as source:
+        temp_file_path, content_hash = save_upload(source)
+    return ingest_pdf(temp_file_path, filename, user_id, job_id, content_hash)
+
+def warm_models():
+    """Load Docling, the embedding model and its tokenizer before the batch's jobs start."""
+    from services.ocr_service import init_ocr
+    from services.embedding_service import get_model, get_tokenizer
+    init_ocr()
+    if ADAPTIVE_OCR:
+        init_ocr(do_ocr=False)
+    get_model()
+    get_tokenizer()
+
+def queue_batch(items, user_id: str, source: str) -> dict:
+    """
+    Queue items from stage_uploads or archive_members as one batch.
+    Staged temp files are removed if the batch is rejected.
+    """
+    if not items:
+        raise BatchError("No PDF files found")
+    if len(items) > INGEST_BATCH_MAX_FILES:
+        discard(items)
+        check_batch_size(len(items), 0)
+
+    # Longest processing time first: the biggest PDFs do not end up running alone at the end
+    items = sorted(items, key=lambda item: item[1], reverse=True)
+    jobs = []
+    for filename, size, staged in items:
+        job_id = str(uuid.uuid4())
+        if isinstance(staged, tuple):
+            temp_file_path, content_hash = staged
+            fn, args = ingest_pdf, (temp_file_path, filename, user_id, job_id, content_hash)
+        else:
+            fn, args = ingest_member, (staged, filename, user_id, job_id)
+        jobs.append((job_id, fn, args, {"filename": filename, "size": size}))
+
+    batch_id = str(uuid.uuid4())
+    submit_batch(batch_id, jobs, setup=warm_models, user_id=user_id, source=source)
+    return {
+        "status": "queued",
+        "batch_id": batch_id,
+        "files": [{"filename": meta["filename"], "job_id": job_id} for job_id, _, _, meta in jobs]
+    }
+
+def wait_for_batch(batch_id: str, interval: float = 2.0) -> dict:
+    """Poll a batch until it completes, printing aggregate progress."""
+    while True:
+        batch = get_batch(batch_id)
+        counts = batch["counts"]
+        print(f"{batch['progress']:3d}% | {counts['completed']} done, {counts['running']} running, "
+              f"{counts['queued']} queued, {counts['failed']} failed | {batch['chunks_indexed']} chunks")
+        if batch["status"] == "completed":
+            return batch
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest every PDF in a directory or zip archive as one batch.")
+    parser.add_argument("path", help="directory, zip archive or PDF")
+    parser.add_argument("--user-id", required=True, help="owner of the imported documents")
+    parser.add_argument("--sequential", action="store_true",
+                        help="ingest one file after another on this thread instead (for comparison)")
+    args = parser.parse_args()
+
+    members = archive_members(args.path)
+    start = time.perf_counter()
+    if args.sequential:
+        failed = 0
+        for filename, _, opener in members:
+            try:
+                ingest_member(opener, filename, args.user_id, str(uuid.uuid4()))
+            except Exception:
+                failed += 1
+    else:
+        queued = queue_batch(members, args.user_id, source=str(Path(args.path).resolve()))
+        failed = wait_for_batch(queued["batch_id"])["counts"]["failed"]
+    elapsed = time.perf_counter() - start
+    print(f"{len(members)} files in {elapsed:.1f}s ({'sequential' if args.sequential else 'batch'}), {failed} failed")
@@ -11,110 +11,214 @@ def get_supabase():
         _supabase_client = create_client(SUPABASE_URL, key_to_use)
     return _supabase_client
 
-def process_pdf(file, user_id: str):
+def save_upload(file) -> tuple[str, str]:
+    """
+    Copy an uploaded file into a unique temporary .pdf path.
+    The SHA-256 of the content is computed while streaming.
+    Returns (temp_file_path, sha256_hex). The caller owns the file and must remove it.
+    """
     import os
     import tempfile
-    import uuid
-    import shutil
-    import time
-    from services.ocr_service import init_ocr, fast_extract_pdf
-    from services.chunk_service import extract_hierarchy_and_chunk
-    from services.embedding_service import embed_chunks
-    from services.vector_service import store_embeddings
-
-    supabase = get_supabase()
+    import hashlib
 
-    print(f"Processing PDF for user {user_id}...")
-    
-    # Create a temporary file to save the uploaded content
     # Use mkstemp to generate a unique safe path with .pdf extension
     fd, temp_file_path = tempfile.mkstemp(suffix=".pdf")
     os.close(fd) # Close the file descriptor immediately, we just need the path
-    
-    job_id = None
 
+    # Check if it's a FastAPI UploadFile (has .file attribute)
+    source = file.file if hasattr(file, "file") else file
+    digest = hashlib.sha256()
     try:
-        # Save the uploaded file to the temporary path
         with open(temp_file_path, "wb") as buffer:
-            # Check if it's a FastAPI UploadFile (has .file attribute)
-            if hasattr(file, "file"):
-                shutil.copyfileobj(file.file, buffer)
-            else:
-                # Fallback for other file-like objects
-                shutil.copyfileobj(file, buffer)
-        
-        # Initialize OCR (idempotent, loads once)
-        init_ocr()
-        
-        # Generate a job ID
-        job_id = str(uuid.uuid4())
+            while True:
+                block = source.read(1024 * 1024)
+                if not block:
+                    break
+                digest.update(block)
+                buffer.write(block)
+    except Exception:
+        os.remove(temp_file_path)
+        raise
+    return temp_file_path, digest.hexdigest()
+
+def process_pdf(file, user_id: str):
+    """Synchronous ingest of a file-like object. Returns the document id."""
+    import uuid
+    temp_file_path, content_hash = save_upload(file)
+    original_filename = getattr(file, 'filename', 'uploaded_file.pdf')
+    return ingest_pdf(temp_file_path, original_filename, user_id, str(uuid.uuid4()), content_hash)
+
+def save_document_record(temp_file_path: str, original_filename: str, user_id: str, document_id: str):
+    """Upload the PDF to Supabase Storage and insert its documents row."""
+    import time
+    supabase = get_supabase()
+    try:
+        print("Uploading to Supabase...")
+        bucket_name = "documents"
+        # Organize by user_id to prevent collisions and for RLS policies if needed later
+        storage_path = f"{user_id}/{original_filename}"
         
-        # Extract Text and JSON Pages
-        # Returns (full_markdown, json_pages)
-        markdown_text, json_pages = fast_extract_pdf(temp_file_path, job_id)
+        with open(temp_file_path, "rb") as f:
+            supabase.storage.from_(bucket_name).upload(
+                path=storage_path, 
+                file=f, 
+                file_options={"content-type": "application/pdf", "upsert": "true"}
+            )
         
-        if not json_pages:
-            print("No text/content extracted.")
-            return
+        # Save Metadata
+        metadata = {
+            "filename": original_filename,
+            "user_id": user_id, 
+            "upload_time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "storage_path": storage_path,
+            "job_id": document_id
+        }
+        supabase.table("documents").insert(metadata).execute()
+        print("Metadata saved to Supabase.")
 
-        original_filename = getattr(file, 'filename', 'uploaded_file.pdf')
+    except Exception as e:
+        print(f"Error uploading to Supabase: {e}")
+        raise e
 
+def ingest_pdf(temp_file_path: str, original_filename: str, user_id: str, job_id: str, content_hash: str | None = None):
+    """
+    Run OCR, chunking, embedding and storage for a PDF already saved at temp_file_path.
+    job_id doubles as the Qdrant document_id. The temp file is removed when done.
 
-        # --- Supabase Integration ---
-        try:
-            print("Uploading to Supabase...")
-            bucket_name = "documents"
-            # Organize by user_id to prevent collisions and for RLS policies if needed later
-            storage_path = f"{user_id}/{original_filename}"
-            
-            with open(temp_file_path, "rb") as f:
-                supabase.storage.from_(bucket_name).upload(
-                    path=storage_path, 
-                    file=f, 
-                    file_options={"content-type": "application/pdf", "upsert": "true"}
-                )
+    Stages are streamed: chapters flow into the chunker and chunks are embedded and
+    upserted in INGEST_BATCH_SIZE batches with bounded queues in between, so OCR,
+    chunking, embedding and storage overlap and chunks are searchable as they arrive.
+    Keywords are scored across the whole document, so they (and the sparse vectors
+    built from them) are written in a second pass once the last chunk is stored.
+
+    When content_hash matches a cached ingest, OCR and embedding are skipped and the
+    returned document id may be that of an earlier upload of the same file.
+    Raises ValueError when the PDF yields no text or no chunks, so the job is marked failed.
+    """
+    import os
+    from itertools import chain
+    from config import INGEST_BATCH_SIZE, INGEST_QUEUE_DEPTH, SUMMARY_PRECOMPUTE
+    from services.summary_service import precompute_summary
+    from services.ocr_service import init_ocr, stream_extract_pdf, write_job
+    from services.chunk_service import iter_document_chunks, assign_keywords, CHUNKER_VERSION
+    from services.embedding_service import embed_packed, EMBEDDING_VERSION
+    from services.vector_service import store_embeddings, store_keywords
+    from services import content_cache
+    from pipelines.stream_pipeline import run_stages
+
+    print(f"Processing PDF for user {user_id}...")
+
+    writer = None
+    try:
+        cached = content_cache.lookup(content_hash)
+
+        # Same bytes already indexed for this user: point the new record at the existing vectors.
+        # Other users get their own copy below, since points are scoped by user_id.
+        if cached and cached["document_id"] and cached["user_id"] == user_id:
+            save_document_record(temp_file_path, original_filename, user_id, cached["document_id"])
+            print(f"Reused existing document {cached['document_id']} for {original_filename}")
+            return cached["document_id"]
+
+        # Chunks and vectors cached, only the vector DB copy is gone: re-upload them
+        if cached and cached["has_vectors"]:
+            chunks_data, vectors = content_cache.load_vectors(content_hash)
+            save_document_record(temp_file_path, original_filename, user_id, job_id)
+            for chunk in chunks_data:
+                chunk['metadata']['document_id'] = job_id
+                chunk['metadata']['filename'] = original_filename
+                chunk['metadata']['user_id'] = user_id
+            for i in range(0, len(chunks_data), INGEST_BATCH_SIZE):
+                store_embeddings(chunks_data[i:i + INGEST_BATCH_SIZE], vectors[i:i + INGEST_BATCH_SIZE])
+            content_cache.set_document(content_hash, job_id, user_id)
+            if SUMMARY_PRECOMPUTE:
+                precompute_summary(job_id)
+            print(f"Re-indexed {original_filename} from cache ({len(chunks_data)} chunks)")
+            return job_id
+
+        if cached:
+            pages = iter(content_cache.load_chapters(content_hash))
+        else:
+            # Initialize OCR (idempotent, loads once)
+            init_ocr()
             
-            # Save Metadata
-            metadata = {
-                "filename": original_filename,
-                "user_id": user_id, 
-                "upload_time": time.strftime('%Y-%m-%dT%H:%M:%S'),
-                "storage_path": storage_path,
-                "job_id": job_id
-            }
-            supabase.table("documents").insert(metadata).execute()
-            print("Metadata saved to Supabase.")
-
-        except Exception as e:
-            print(f"Error uploading to Supabase: {e}")
-            raise e
-
-        # Advanced Chunking with Hierarchy
-        result = extract_hierarchy_and_chunk(json_pages)
-        print("Chunking.........")
-        chunks_data = result['chunks']
+            # Convert now; chapters are produced lazily
+            pages = stream_extract_pdf(temp_file_path, job_id)
+        writer = content_cache.CacheWriter(content_hash)
         
-        if not chunks_data:
-             print("No chunks created from content.")
-             return None
+        first_page = next(pages, None)
+        if first_page is None:
+            raise ValueError("No text could be extracted from the PDF")
+        write_job(job_id, {"progress": 60})
 
-        # Inject document-level metadata into each chunk
-        for chunk in chunks_data:
-            chunk['metadata']['document_id'] = job_id
-            chunk['metadata']['filename'] = original_filename
+        # --- Supabase Integration ---
+        save_document_record(temp_file_path, original_filename, user_id, job_id)
 
-        # Prepare for embedding - extract just the text content
-        texts_to_embed = [c['content'] for c in chunks_data]
-        
-        vectors = embed_chunks(texts_to_embed)
-        store_embeddings(chunks_data, vectors)
+        def tee_pages():
+            for page in chain([first_page], pages):
+                writer.add_chapter(page)
+                yield page
+            writer.commit_chapters()
+
+        def with_metadata(chunks):
+            # Inject document-level metadata into each chunk
+            for index, chunk in enumerate(chunks):
+                chunk['metadata']['chunk_index'] = index
+                chunk['metadata']['document_id'] = job_id
+                chunk['metadata']['filename'] = original_filename
+                chunk['metadata']['user_id'] = user_id
+                chunk['metadata']['chunker_version'] = CHUNKER_VERSION
+                chunk['metadata']['embedding_version'] = EMBEDDING_VERSION
+                yield chunk
+
+        def embed_batch(batch):
+            # Shared encoder: batches of other documents being ingested are packed with this one
+            return batch, embed_packed([c['content'] for c in batch])
+
+        # Only the text is kept for the keyword pass; vectors are dropped once stored
+        stored = []
+        def store_batch(item):
+            batch, vectors = item
+            store_embeddings(batch, vectors)
+            writer.add_batch(batch, vectors)
+            stored.extend({"content": c['content'], "metadata": {
+                "document_id": job_id, "chunk_index": c['metadata']['chunk_index']
+            }} for c in batch)
+            write_job(job_id, {"chunks_indexed": len(stored)})
+
+        # Chunking with Hierarchy -> embedding -> storage, overlapped
+        run_stages(
+            with_metadata(iter_document_chunks(tee_pages())),
+            stages=[embed_batch],
+            sink=store_batch,
+            batch_size=INGEST_BATCH_SIZE,
+            depth=INGEST_QUEUE_DEPTH
+        )
+        total_chunks = len(stored)
+
+        if total_chunks:
+            assign_keywords(stored)
+            for i in range(0, total_chunks, INGEST_BATCH_SIZE):
+                store_keywords(stored[i:i + INGEST_BATCH_SIZE])
+            writer.set_keywords([c['metadata']['keywords'] for c in stored])
+
+        if not total_chunks:
+            # The record saved above would point at no vectors
+            get_supabase().table("documents").delete().eq("job_id", job_id).execute()
+            raise ValueError("No chunks could be created from the PDF's content")
+
+        writer.commit(job_id, user_id)
+
+        if SUMMARY_PRECOMPUTE:
+            precompute_summary(job_id)
         
         print(f"Successfully processed {original_filename}")
-        print(f"Total Chunks: {len(chunks_data)}")
+        print(f"Total Chunks: {total_chunks}")
         
         return job_id
 
     except Exception as e:
+        if writer is not None:
+            writer.abort()
         print(f"Error processing PDF: {e}")
         import traceback
         traceback.print_exc()
@@ -123,15 +227,6 @@ def process_pdf(file, user_id: str):
         # Clean up the temporary file
         if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
-        
-        # Cleanup extracted chapters directory
-        if job_id:
-            try:
-                chapters_dir = f"extracted_chapters_{job_id}"
-                if os.path.exists(chapters_dir):
-                    shutil.rmtree(chapters_dir)
-            except Exception as e:
-                print(f"Error cleaning up chapters directory: {e}")
 
 if __name__ == "__main__":
     print("This pipeline is intended to be run via the API with a file upload.")
\ No newline at end of file
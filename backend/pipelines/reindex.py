@@ -0,0 +1,172 @@
+import sys
+import os
+
+# Add the backend directory to sys.path so this runs as a script too
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import numpy as np
+from config import INGEST_BATCH_SIZE
+from db.vector_store import get_vector_store
+from services import content_cache
+from services.chunk_service import chunk_document, CHUNKER_VERSION
+from services.embedding_service import embed_chunks, EMBEDDING_VERSION
+from services.vector_service import store_embeddings, content_hash
+from services.query_cache import bump_index_generation
+
+# Re-index after a chunker or embedding model change.
+# Every document is copied into a shadow store that is swapped in at the end:
+#   - documents whose chunks carry an old CHUNKER_VERSION are re-chunked from the
+#     cached Docling chapters (no OCR); without cached chapters their chunks are kept
+#   - a chunk keeps its stored vector when its text and EMBEDDING_VERSION match,
+#     everything else is re-embedded
+#   - points stored before user_id was part of the payload get their owner from
+#     the Supabase documents table (the first uploader, if several share the id)
+#   - documents whose point count changed since they were copied (ingests still
+#     running, new uploads, deletes) are copied again, until nothing changes and once
+#     more when the old data stops taking writes during the swap
+# With VECTOR_BACKEND=local the swap waits for every server process using the store
+# to exit: stop them when asked and start them again afterwards.
+# Usage (from backend/): python -m pipelines.reindex [--dry-run]
+
+# Payload keys that are not chunk metadata
+POINT_KEYS = ("text", "chunk_id", "content_hash")
+
+def chunk_from_point(payload):
+    """Rebuild the chunk node a stored point was made from."""
+    return {
+        "id": payload.get("chunk_id", ""),
+        "content": payload.get("text", ""),
+        "metadata": {k: v for k, v in payload.items() if k not in POINT_KEYS}
+    }
+
+def document_owner(document_id):
+    from pipelines.pdf_pipeline import get_supabase
+    rows = (
+        get_supabase().table("documents")
+        .select("user_id")
+        .eq("job_id", document_id)
+        .order("created_at")
+        .limit(1)
+        .execute()
+        .data
+    )
+    return rows[0]["user_id"] if rows else None
+
+def rechunk(document_id, chapters, document_meta):
+    chunks = chunk_document(chapters)
+    for index, chunk in enumerate(chunks):
+        chunk['metadata']['chunk_index'] = index
+        chunk['metadata'].update(document_meta)
+        chunk['metadata']['document_id'] = document_id
+        chunk['metadata']['chunker_version'] = CHUNKER_VERSION
+    return chunks
+
+def reindex_document(live, shadow, document_id, dry_run=False):
+    """Copy one document into shadow, re-chunking and re-embedding only what is stale."""
+    points = list(live.scroll_document(document_id, with_vectors=True))
+    if not points:
+        return None
+    points.sort(key=lambda p: p.payload.get("chunk_index", 0))
+
+    # Vectors that are still valid, by (text, embedding version)
+    reusable = {
+        (p.payload.get("content_hash"), p.payload.get("embedding_version")): p.vector
+        for p in points if p.vector is not None
+    }
+
+    user_id = points[0].payload.get("user_id") or document_owner(document_id)
+    chunks = None
+    cache_key = content_cache.hash_for_document(document_id)
+    if any(p.payload.get("chunker_version") != CHUNKER_VERSION for p in points):
+        chapters = content_cache.load_chapters(cache_key) if cache_key else None
+        if chapters:
+            document_meta = {"filename": points[0].payload.get("filename"), "user_id": user_id}
+            chunks = rechunk(document_id, chapters, document_meta)
+        else:
+            print(f"No cached chapters for {document_id}; keeping its chunks as they are")
+    rechunked = chunks is not None
+    if not rechunked:
+        chunks = [chunk_from_point(p.payload) for p in points]
+
+    vectors = [reusable.get((content_hash(c['content']), EMBEDDING_VERSION)) for c in chunks]
+    stale = [i for i, v in enumerate(vectors) if v is None]
+    stats = {"points": len(points), "chunks": len(chunks), "embedded": len(stale), "rechunked": rechunked}
+    if dry_run:
+        return stats
+
+    if stale:
+        fresh = embed_chunks([chunks[i]['content'] for i in stale])
+        for i, vector in zip(stale, fresh):
+            vectors[i] = vector
+    vectors = np.asarray(vectors, dtype=np.float32)
+    for chunk in chunks:
+        chunk['metadata']['embedding_version'] = EMBEDDING_VERSION
+        chunk['metadata']['user_id'] = user_id
+
+    for i in range(0, len(chunks), INGEST_BATCH_SIZE):
+        store_embeddings(chunks[i:i + INGEST_BATCH_SIZE], vectors[i:i + INGEST_BATCH_SIZE], store=shadow,
+                         skip_existing=True)
+
+    # Keep the content cache in step, so a re-upload restores the new chunks
+    if cache_key and rechunked:
+        writer = content_cache.CacheWriter(cache_key)
+        for chapter in content_cache.load_chapters(cache_key):
+            writer.add_chapter(chapter)
+        writer.add_batch(chunks, vectors)
+        writer.commit(document_id, user_id)
+    return stats
+
+def reindex(dry_run=False):
+    live = get_vector_store()
+    shadow = None if dry_run else live.create_shadow()
+    totals = {"documents": 0, "chunks": 0, "embedded": 0, "rechunked": 0}
+    # document id -> number of live points it was copied from
+    copied = {}
+
+    def copy(source, document_ids):
+        for document_id in document_ids:
+            stats = reindex_document(source, shadow, document_id, dry_run=dry_run)
+            if stats is None:
+                continue
+            if document_id not in copied:
+                totals["documents"] += 1
+            copied[document_id] = stats["points"]
+            totals["chunks"] += stats["chunks"]
+            totals["embedded"] += stats["embedded"]
+            totals["rechunked"] += int(stats["rechunked"])
+            print(f"{document_id}: {stats['chunks']} chunks, {stats['embedded']} embedded"
+                  f"{', re-chunked' if stats['rechunked'] else ''}")
+
+    def reconcile(source):
+        """Copy documents that changed in source since they were copied, drop deleted ones. Returns how many."""
+        current = source.document_ids()
+        changed = [d for d in current if copied.get(d) != source.count_document(d)]
+        copy(source, changed)
+        gone = set(copied) - set(current)
+        for document_id in gone:
+            shadow.delete_document(document_id)
+            del copied[document_id]
+        return len(changed) + len(gone)
+
+    copy(live, live.document_ids())
+
+    if not dry_run:
+        # Catch up with uploads, deletes and ingests that ran during the copy
+        for _ in range(3):
+            if not reconcile(live):
+                break
+        live.swap_in(shadow, reconcile=reconcile)
+        bump_index_generation()
+
+    print(f"Re-index {'plan' if dry_run else 'done'}: {totals['documents']} documents, "
+          f"{totals['chunks']} chunks, {totals['embedded']} to embed, {totals['rechunked']} re-chunked "
+          f"(chunker {CHUNKER_VERSION}, embeddings {EMBEDDING_VERSION})")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-chunk and re-embed stale chunks into a shadow store, then swap it in.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be re-chunked and re-embedded")
+    args = parser.parse_args()
+    reindex(dry_run=args.dry_run)
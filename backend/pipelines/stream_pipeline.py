@@ -0,0 +1,94 @@
+import queue
+import threading
+from itertools import islice
+from typing import Callable, Iterable, List
+
+# Marks the end of a stage's output
+_DONE = object()
+
+def batched(items: Iterable, size: int):
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def run_stages(source: Iterable, stages: List[Callable], sink: Callable, batch_size: int, depth: int):
+    """
+    Run a batched producer -> stages -> sink pipeline with bounded queues.
+
+    source is consumed in batches of batch_size on its own thread; each stage
+    maps one batch to the next stage's input on its own thread; sink is called
+    on the caller's thread. At most depth items wait between any two stages,
+    so memory stays flat regardless of input size. The first error from any
+    thread stops the pipeline and is re-raised here.
+    """
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=depth) for _ in range(len(stages) + 1)]
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def produce():
+        try:
+            for batch in batched(source, batch_size):
+                if stop.is_set():
+                    return
+                put(queues[0], batch)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(queues[0], _DONE)
+
+    def work(fn, inbox, outbox):
+        try:
+            while True:
+                item = get(inbox)
+                if item is _DONE:
+                    return
+                put(outbox, fn(item))
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(outbox, _DONE)
+
+    threads = [threading.Thread(target=produce, name="stage-source", daemon=True)]
+    for i, fn in enumerate(stages):
+        threads.append(threading.Thread(
+            target=work, args=(fn, queues[i], queues[i + 1]), name=f"stage-{i}", daemon=True
+        ))
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            item = get(queues[-1])
+            if item is _DONE:
+                break
+            sink(item)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
@@ -1,6 +1,39 @@
 import re
-import uuid
-from typing import List, Dict, Any
+import hashlib
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Iterable, Iterator
+from config import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_WORKERS, CHUNK_PARALLEL_MIN_PAGES
+from services.embedding_service import MODEL_NAME
+
+# Common stop words (short list) shared by keyword extraction and lexical indexing
+STOP_WORDS = {"the", "and", "is", "of", "to", "in", "a", "for", "that", "this", "on", "with", "as", "are", "it", "be", "by", "or", "from", "at", "an", "was", "not"}
+
+# REQ 5: TOKEN-AWARE CHUNK SIZE
+# Measured with the embedding model's tokenizer; [CLS] and [SEP] take two of CHUNK_TOKENS
+SPECIAL_TOKENS = 2
+CHUNK_BUDGET = CHUNK_TOKENS - SPECIAL_TOKENS
+OVERLAP_TOKENS = min(CHUNK_OVERLAP_TOKENS, CHUNK_BUDGET // 2)
+
+# Stored on every chunk; bump the leading number whenever chunk boundaries
+# or content change, so pipelines/reindex.py knows which documents to re-chunk
+CHUNKER_VERSION = f"4:{MODEL_NAME}:{CHUNK_TOKENS}/{OVERLAP_TOKENS}"
+
+# REQ 1: REGEX IMPROVEMENTS
+# Relaxed & Case-insensitive. 
+# Supports: Markdown (#), Numbered (1.), Mixed case text.
+# Chapter examples: "# Title", "1. Introduction", "Chapter 1"
+CHAPTER_PATTERN = re.compile(r'^(#\s|chapter\s+\d|\d+\.\s).*', re.IGNORECASE)
+
+# Section examples: "## Title", "### Title", "1.1 Subsection", "1.2.3 Detail"
+SECTION_PATTERN = re.compile(r'^(#{2,6}\s|\d+(\.\d+)+\s).*', re.IGNORECASE)
+
+# Header context a parallel chunking task inherits from the task before it; resolved on merge
+INHERITED = "\x00inherited"
+
+# Keywords kept per chunk
+KEYWORDS_PER_CHUNK = 5
+# ASCII bytes deleted before splitting words
+NON_LETTER_BYTES = bytes(b for b in range(128) if not (chr(b).isalpha() or chr(b).isspace()))
 
 def extract_hierarchy_and_chunk(json_pages: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
@@ -8,27 +41,72 @@ def extract_hierarchy_and_chunk(json_pages: List[Dict[str, Any]]) -> Dict[str, A
     Docs: https://github.com/pymupdf/pymupdf
     """
     hierarchy = []
+    chunks = chunk_document(json_pages, hierarchy)
+
+    return {
+        "hierarchy": hierarchy,
+        "chunks": chunks,
+        "ready_for_embedding": True
+    }
+
+def chunk_document(json_pages: Iterable[Dict[str, Any]], hierarchy: List | None = None,
+                   workers: int = CHUNK_WORKERS) -> List[Dict[str, Any]]:
+    """All chunks of a document, with keywords scored across the whole document."""
+    chunks = list(iter_document_chunks(json_pages, hierarchy, workers))
+    assign_keywords(chunks)
+    return chunks
+
+def iter_document_chunks(json_pages: Iterable[Dict[str, Any]], hierarchy: List | None = None,
+                         workers: int = CHUNK_WORKERS) -> Iterator[Dict[str, Any]]:
+    """
+    Chunks of a document in order, keywords left for assign_keywords.
+    Serial chunking streams: chunks come out while pages go in. With workers > 1 the
+    pages are collected first, and documents of at least CHUNK_PARALLEL_MIN_PAGES pages
+    are chunked on a process pool; the result is identical to the serial run.
+    """
+    if hierarchy is None:
+        hierarchy = []
+    if workers > 1:
+        json_pages = list(json_pages)
+        if len(json_pages) >= CHUNK_PARALLEL_MIN_PAGES:
+            yield from chunk_parallel(json_pages, hierarchy, workers)
+            return
+    yield from iter_hierarchy_and_chunks(json_pages, hierarchy)
+
+def iter_hierarchy_and_chunks(json_pages: Iterable[Dict[str, Any]], hierarchy: List | None = None,
+                              context: Dict[str, str] | None = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming form of extract_hierarchy_and_chunk.
+    Consumes pages lazily and yields chunk nodes as soon as each page is processed.
+    Headers found along the way are appended to hierarchy when given.
+    context holds the header state ("chapter", "section") to start from and is left
+    with the state at the end.
+    Keywords need the whole document: they are left empty until assign_keywords runs.
+    """
+    if hierarchy is None:
+        hierarchy = []
+    if context is None:
+        context = {}
     chunks = []
     
-    current_chapter = "Unknown Chapter"
-    current_section = "Unknown Section"
-    
-    # REQ 1: REGEX IMPROVEMENTS
-    # Relaxed & Case-insensitive. 
-    # Supports: Markdown (#), Numbered (1.), Mixed case text.
-    # Chapter examples: "# Title", "1. Introduction", "Chapter 1"
-    chapter_pattern = re.compile(r'^(#\s|chapter\s+\d|\d+\.\s).*', re.IGNORECASE)
-    
-    # Section examples: "## Title", "### Title", "1.1 Subsection", "1.2.3 Detail"
-    section_pattern = re.compile(r'^(#{2,6}\s|\d+(\.\d+)+\s).*', re.IGNORECASE)
+    current_chapter = context.get("chapter", "Unknown Chapter")
+    current_section = context.get("section", "Unknown Section")
     
     # REQ 3: DO NOT FLUSH BUFFER AT PAGE BOUNDARIES
     # We maintain a persistent buffer across pages to merge content.
-    buffer_text = ""
+    # The buffer is a list of paragraphs (each a list of lines), joined once on flush.
+    paragraphs = []
+    new_paragraph = True
     # Track the page number where the current buffer started
     buffer_start_page = 1
+
+    def flush():
+        if paragraphs:
+            text = "\n\n".join("\n".join(lines) for lines in paragraphs)
+            create_chunks(chunks, text, buffer_start_page, current_chapter, current_section)
+            paragraphs.clear()
     
-    print(f"DEBUG: Processing {len(json_pages)} pages/chapters for chunking...")
+    print("DEBUG: Processing pages/chapters for chunking...")
 
     for page_data in json_pages:
         # Use simple 'page' key or fallback
@@ -45,24 +123,22 @@ def extract_hierarchy_and_chunk(json_pages: List[Dict[str, Any]]) -> Dict[str, A
             continue
 
         # If buffer is empty, mark start page as current page
-        if not buffer_text:
+        if not paragraphs:
             buffer_start_page = page_num
+        # A new page never continues the previous paragraph
+        new_paragraph = True
             
-        # Normalize double newlines for paragraph splitting if needed, 
-        # but here we process line by line for headers
-        lines = content.split('\n')
-        
-        for line in lines:
+        for line in content.split('\n'):
             line = line.strip()
             if not line:
+                # Blank line: paragraph boundary
+                new_paragraph = True
                 continue
                 
             # Check for Chapter (Priority over Section)
-            if chapter_pattern.match(line):
+            if CHAPTER_PATTERN.match(line):
                 # Flush previous buffer before starting new chapter
-                if buffer_text:
-                    create_chunks(chunks, buffer_text, buffer_start_page, current_chapter, current_section)
-                    buffer_text = ""
+                flush()
                 
                 # Update Context
                 current_chapter = line.replace('#', '').strip()
@@ -70,17 +146,16 @@ def extract_hierarchy_and_chunk(json_pages: List[Dict[str, Any]]) -> Dict[str, A
                 hierarchy.append({"page": page_num, "chapter": current_chapter})
                 
                 # REQ 2: INCLUDE HEADERS IN CHUNKS
-                # Start new buffer with the header line
-                buffer_text = line
+                # Start new buffer with the header line as its own paragraph
+                paragraphs.append([line])
+                new_paragraph = True
                 buffer_start_page = page_num
                 continue 
             
             # Check for Section
-            if section_pattern.match(line):
+            if SECTION_PATTERN.match(line):
                 # Flush previous buffer before starting new section
-                if buffer_text:
-                    create_chunks(chunks, buffer_text, buffer_start_page, current_chapter, current_section)
-                    buffer_text = ""
+                flush()
                 
                 # Update Context
                 current_section = line.replace('#', '').strip()
@@ -88,90 +163,175 @@ def extract_hierarchy_and_chunk(json_pages: List[Dict[str, Any]]) -> Dict[str, A
                 hierarchy.append({"page": page_num, "chapter": current_chapter, "section": current_section})
                 
                 # REQ 2: INCLUDE HEADERS IN CHUNKS
-                # Start new buffer with the header line
-                buffer_text = line
+                # Start new buffer with the header line as its own paragraph
+                paragraphs.append([line])
+                new_paragraph = True
                 buffer_start_page = page_num
                 continue
             
             # Standard Text Line
-            if buffer_text:
-                buffer_text += "\n" + line
-            else:
-                buffer_text = line
+            if not paragraphs:
                 buffer_start_page = page_num
+            if new_paragraph or not paragraphs:
+                paragraphs.append([line])
+                new_paragraph = False
+            else:
+                paragraphs[-1].append(line)
         
         # REQ 3: Removed logic that flushes buffer here. 
         # We loop to next page accumulating text.
 
+        # Hand finished chunks downstream before reading the next page
+        yield from chunks
+        chunks.clear()
+
     # Flush any remaining text at the End of Document
-    if buffer_text:
-        create_chunks(chunks, buffer_text, buffer_start_page, current_chapter, current_section)
+    flush()
+    yield from chunks
+    context["chapter"] = current_chapter
+    context["section"] = current_section
 
-    return {
-        "hierarchy": hierarchy,
-        "chunks": chunks,
-        "ready_for_embedding": True
-    }
+# --- Parallel chunking -------------------------------------------------------
+
+_CHUNK_POOL = None
+
+def get_chunk_pool(workers: int = CHUNK_WORKERS):
+    global _CHUNK_POOL
+    if _CHUNK_POOL is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        print(f"🔄 Starting chunking pool with {workers} processes...")
+        # spawn: same as the OCR pool, the parent may hold torch state
+        _CHUNK_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _CHUNK_POOL
+
+def starts_with_header(page: Dict[str, Any]) -> bool:
+    """True when the page's first non-blank line is a chapter or section header (the buffer is flushed there)."""
+    content = page.get('content', '') or page.get('markdown', '')
+    for line in content.split('\n'):
+        line = line.strip()
+        if line:
+            return bool(CHAPTER_PATTERN.match(line) or SECTION_PATTERN.match(line))
+    return False
+
+def plan_tasks(json_pages: List[Dict[str, Any]], tasks: int) -> List[List[Dict[str, Any]]]:
+    """
+    Split pages into about `tasks` runs of similar size. A run may only start on a page that
+    begins with a header, so no text buffer spans two runs.
+    """
+    total = sum(len(p.get('content', '') or p.get('markdown', '')) for p in json_pages)
+    target = max(total // max(tasks, 1), 1)
+    runs = [[]]
+    size = 0
+    for page in json_pages:
+        if runs[-1] and size >= target and starts_with_header(page):
+            runs.append([])
+            size = 0
+        runs[-1].append(page)
+        size += len(page.get('content', '') or page.get('markdown', ''))
+    return runs
+
+def _chunk_task(pages, first):
+    """Worker: chunk a run of pages. Runs after the first start from an inherited header context."""
+    context = {} if first else {"chapter": INHERITED, "section": INHERITED}
+    hierarchy = []
+    chunks = list(iter_hierarchy_and_chunks(pages, hierarchy, context))
+    return chunks, hierarchy, context
+
+def chunk_parallel(json_pages, hierarchy, workers=CHUNK_WORKERS):
+    """Chunk runs of chapters on the pool, then merge in page order, resolving inherited headers."""
+    runs = plan_tasks(json_pages, workers * 4)
+    pool = get_chunk_pool(workers)
+    futures = [pool.submit(_chunk_task, run, i == 0) for i, run in enumerate(runs)]
+
+    chunks = []
+    context = {"chapter": "Unknown Chapter", "section": "Unknown Section"}
+    for future in futures:
+        part_chunks, part_hierarchy, part_context = future.result()
+        for node in part_hierarchy + [c["metadata"] for c in part_chunks]:
+            for key in ("chapter", "section"):
+                if node.get(key) == INHERITED:
+                    node[key] = context[key]
+        chunks.extend(part_chunks)
+        hierarchy.extend(part_hierarchy)
+        for key in ("chapter", "section"):
+            if part_context[key] != INHERITED:
+                context[key] = part_context[key]
+    return chunks
+
+def _last_in(positions, lo, hi):
+    """Largest position p with lo < p <= hi, or None."""
+    i = bisect_right(positions, hi)
+    if i and positions[i - 1] > lo:
+        return positions[i - 1]
+    return None
 
 def create_chunks(chunks_list, text, page, chapter, section):
     """
     Step 2: Chunk Smartly (Token-Aware)
-    Target ~500 tokens. 
-    1 token ≈ 4 chars. So ~2000 chars.
+    Each chunk holds at most CHUNK_TOKENS word-pieces of the embedding model, so its
+    vector covers all of its text. Cuts fall on paragraph breaks ('\n\n') when one fits,
+    else between words. A paragraph split mid-way repeats OVERLAP_TOKENS tokens at the
+    start of the next chunk. The text is tokenized once; sizes are read off the offsets.
     """
-    # REQ 5: TOKEN-AWARE CHUNK SIZE
-    TARGET_TOKENS = 500
-    CHARS_PER_TOKEN = 4
-    MAX_CHARS = TARGET_TOKENS * CHARS_PER_TOKEN  # ~2000 chars
-    
-    # Split by double newlines to respect paragraphs
-    paragraphs = text.split('\n\n')
-    
-    current_chunk = ""
-    
-    for para in paragraphs:
-        # Check size if we add this paragraph
-        # (Len current + Len para + 1 whitespace)
-        if len(current_chunk) + len(para) > MAX_CHARS:
-            # If current_chunk has content, save it before starting new
-            if current_chunk:
-                add_chunk_node(chunks_list, current_chunk, page, chapter, section)
-                current_chunk = ""
-            
-            # If the paragraph itself is larger than the limit, we must split it
-            if len(para) > MAX_CHARS:
-                # Naive split by spaces to keep it simple and library-free
-                words = para.split(' ')
-                temp_chunk = ""
-                for word in words:
-                    if len(temp_chunk) + len(word) + 1 > MAX_CHARS:
-                        add_chunk_node(chunks_list, temp_chunk, page, chapter, section)
-                        temp_chunk = word
-                    else:
-                        temp_chunk += (" " + word) if temp_chunk else word
-                
-                # Assign remainder to current_chunk (might be empty or start of next)
-                current_chunk = temp_chunk
-            else:
-                current_chunk = para
-        else:
-            if current_chunk:
-                current_chunk += "\n\n" + para
-            else:
-                current_chunk = para
-                
-    # Add trailing content
-    if current_chunk:
-        add_chunk_node(chunks_list, current_chunk, page, chapter, section)
+    from services.embedding_service import get_tokenizer
+
+    offsets = get_tokenizer()(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        return_token_type_ids=False
+    )["offset_mapping"]
+    n = len(offsets)
+    if not n:
+        return
+
+    # Token indices where a word (whitespace before) or a paragraph (blank line before) starts
+    word_starts = []
+    paragraph_starts = []
+    for i in range(1, n):
+        gap_start, gap_end = offsets[i - 1][1], offsets[i][0]
+        if gap_end > gap_start:
+            word_starts.append(i)
+            if "\n\n" in text[gap_start:gap_end]:
+                paragraph_starts.append(i)
+
+    start = 0
+    previous_end = 0
+    previous_end_char = 0
+    while True:
+        end = min(start + CHUNK_BUDGET, n)
+        split_paragraph = False
+        if end < n:
+            # Never cut at or before the previous cut, so every chunk makes progress
+            lo = max(start, previous_end)
+            cut = _last_in(paragraph_starts, lo, end)
+            if cut is None:
+                split_paragraph = True
+                cut = _last_in(word_starts, lo, end) or end
+            end = cut
+
+        start_char, end_char = offsets[start][0], offsets[end - 1][1]
+        overlap_chars = max(previous_end_char - start_char, 0) if start else 0
+        add_chunk_node(chunks_list, text[start_char:end_char], page, chapter, section, overlap_chars)
+        if end >= n:
+            break
 
-def add_chunk_node(chunks_list, text, page, chapter, section):
+        previous_end, previous_end_char = end, end_char
+        start = end
+        if split_paragraph and OVERLAP_TOKENS:
+            # Step back into the previous chunk, starting on a word
+            i = bisect_left(word_starts, end - OVERLAP_TOKENS)
+            if i < len(word_starts) and word_starts[i] < end:
+                start = word_starts[i]
+
+def add_chunk_node(chunks_list, text, page, chapter, section, overlap_chars=0):
     text = text.strip()
     if not text: return
     
-    chunk_id = f"chunk_{uuid.uuid4().hex[:8]}"
-    
-    # REQ 6: KEEP KEYWORD EXTRACTION LIGHT (Existing function)
-    full_keywords = extract_keywords(text)
+    # Content-derived, so re-chunking the same text yields the same id
+    chunk_id = f"chunk_{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
     
     # REQ 4: FIX METADATA & REQ 7: PRESERVE OUTPUT FORMAT
     # Removed 'chapter_index'. Added 'chapter', 'section', 'keywords'.
@@ -182,38 +342,127 @@ def add_chunk_node(chunks_list, text, page, chapter, section):
             "page": page,
             "chapter": chapter,
             "section": section,
-            "keywords": full_keywords
+            "keywords": [], # Filled by assign_keywords
+            # Leading characters repeated from the previous chunk (sliding overlap)
+            "overlap_chars": overlap_chars
         }
     }
     chunks_list.append(node)
 
-def extract_keywords(text):
+def assign_keywords(chunks, top_n=KEYWORDS_PER_CHUNK):
     """
-    Step 3: Keywords (Top 5 nouns)
-    Simple heuristic without heavy NLP lib
+    Step 3: Keywords (REQ 6: one batched pass per document)
+    TF-IDF over the document's chunks: a chunk's keywords are the words frequent in it
+    but rare in the rest of the document, rather than the document's generic top words.
+    Words are ASCII letters only, longer than 2 characters, stop words excluded.
     """
-    # Remove special chars
-    clean = re.sub(r'[^a-zA-Z\s]', '', text)
-    words = clean.split()
-    
-    # Filter common stop words (short list)
-    stop_words = {"the", "and", "is", "of", "to", "in", "a", "for", "that", "this", "on", "with", "as", "are", "it", "be", "by", "or", "from", "at", "an", "was", "not"}
-    nouns = [w for w in words if w.lower() not in stop_words and len(w) > 2]
-    
-    # Count frequency
-    counts = {}
-    for n in nouns:
-        n = n.capitalize() # Normalize
-        counts[n] = counts.get(n, 0) + 1
-        
-    # Sort by freq
-    sorted_nouns = sorted(counts.items(), key=lambda x: x[1], reverse=True)
-    return [n[0] for n in sorted_nouns[:5]]
+    import numpy as np
+    from collections import Counter
+    from itertools import chain
+    from scipy.sparse import csr_matrix
+
+    if not chunks:
+        return chunks
+    n = len(chunks)
+
+    # Tokenize: drop non-ASCII, delete non-letters, lowercase, split (all C-level)
+    counts = [
+        Counter(c["content"].encode("ascii", "ignore").translate(None, NON_LETTER_BYTES).lower().split())
+        for c in chunks
+    ]
+    nnz = np.fromiter(map(len, counts), dtype=np.int64, count=n)
+    keys = list(chain.from_iterable(counts))
+    tf = np.fromiter(chain.from_iterable(c.values() for c in counts), dtype=np.float32, count=len(keys))
+    if not keys:
+        for c in chunks:
+            c["metadata"]["keywords"] = []
+        return chunks
+
+    # Vocabulary from the distinct (chunk, word) pairs
+    _, first, term_ids = np.unique(
+        np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys)),
+        return_index=True, return_inverse=True
+    )
+    vocab = [keys[i].decode("ascii") for i in first]
+    valid = np.fromiter((len(w) > 2 and w not in STOP_WORDS for w in vocab), dtype=bool, count=len(vocab))
+    # Alphabetical rank breaks score ties (hash order changes between processes)
+    alpha = np.empty(len(vocab), dtype=np.int64)
+    alpha[sorted(range(len(vocab)), key=vocab.__getitem__)] = np.arange(len(vocab))
+
+    rows = np.repeat(np.arange(n), nnz)
+    mask = valid[term_ids]
+    matrix = csr_matrix((tf[mask], (rows[mask], term_ids[mask])), shape=(n, len(vocab)))
+
+    # Sublinear tf x smoothed idf (row normalization would not change the ranking)
+    df = np.bincount(matrix.indices, minlength=len(vocab))
+    idf = np.log((1 + n) / (1 + df)) + 1
+    matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+
+    # Rank every row's entries at once: by row, then score (desc), then word
+    row_of = np.repeat(np.arange(n), np.diff(matrix.indptr))
+    order = np.lexsort((alpha[matrix.indices], -matrix.data, row_of))
+    rank = np.arange(len(order)) - matrix.indptr[row_of[order]]
+    keep = order[rank < top_n]
+
+    keywords = [[] for _ in chunks]
+    for row, term in zip(row_of[keep], matrix.indices[keep]):
+        keywords[row].append(vocab[term].capitalize()) # Normalize
+    for c, words in zip(chunks, keywords):
+        c["metadata"]["keywords"] = words
+    return chunks
 
 # Backwards compatibility mock if other files import it (though should be updated)
 def chunk_text(text):
     pass
 
 
+def benchmark_fixture(megabytes=4, seed=0):
+    """Synthetic Docling-style chapters: headers, paragraphs, and one long header-less chapter."""
+    import random
+    rng = random.Random(seed)
+    vocabulary = [f"{w}{i}" for i, w in enumerate(["pump", "sensor", "invoice", "model", "layer", "valve", "safety", "order"] * 40)]
+    def paragraph():
+        lines = [" ".join(rng.choices(vocabulary, k=rng.randint(8, 16))) for _ in range(rng.randint(2, 8))]
+        return "\n".join(lines)
+    pages = []
+    size = 0
+    index = 0
+    while size < megabytes * 2**20:
+        index += 1
+        parts = [f"# Chapter {index}"]
+        for s in range(rng.randint(2, 5)):
+            parts.append(f"## {index}.{s + 1} Section")
+            parts.extend(paragraph() for _ in range(rng.randint(3, 12)))
+        content = "\n\n".join(parts)
+        pages.append({"chapter_index": index, "content": content})
+        size += len(content)
+    # Header-less text: one buffer for the whole chapter
+    pages.append({"chapter_index": index + 1, "content": "\n\n".join(paragraph() for _ in range(4000))})
+    return pages
 
+if __name__ == "__main__":
+    # Chunking throughput on a multi-megabyte markdown fixture, serial and on the pool
+    import json
+    import os
+    import time
+    pages = benchmark_fixture()
+    total = sum(len(p["content"]) for p in pages)
+    start = time.perf_counter()
+    chunks = chunk_document(pages, workers=0)
+    elapsed = time.perf_counter() - start
+    longest = max(len(c["content"]) for c in chunks)
+    print(f"{total / 2**20:.1f} MB in {elapsed:.2f}s ({total / 2**20 / elapsed:.1f} MB/s), "
+          f"{len(chunks)} chunks, longest {longest} chars ({CHUNK_TOKENS} tokens, {OVERLAP_TOKENS} overlap)")
 
+    serial = json.dumps(chunks)
+    workers = 2
+    while workers <= max(os.cpu_count() or 1, 2):
+        _CHUNK_POOL = None
+        chunk_document(pages, workers=workers)  # warm up: spawn and load the tokenizer
+        start = time.perf_counter()
+        parallel = chunk_document(pages, workers=workers)
+        seconds = time.perf_counter() - start
+        _CHUNK_POOL.shutdown()
+        assert json.dumps(parallel) == serial, "parallel chunks differ from the serial run"
+        print(f"{workers} workers: {seconds:.2f}s ({elapsed / seconds:.1f}x), identical output")
+        workers *= 2
@@ -0,0 +1,202 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, Optional
+from config import CACHE_DIR, CONTENT_CACHE_ENABLED
+
+# Content-addressed cache for ingest results.
+# Layout:
+#   <CACHE_DIR>/content/<sha256>/chapters.jsonl  Docling chapters, one per line
+#   <CACHE_DIR>/content/<sha256>/chunks.jsonl    chunk nodes, one per line
+#   <CACHE_DIR>/content/<sha256>/vectors.f32     raw float32 embeddings, row-major
+#   <CACHE_DIR>/content/<sha256>/meta.json       {"dim": ..., "document_id": ..., "user_id": ...}
+#   <CACHE_DIR>/by_doc/<document_id>             sha256 of the content behind a document
+# Files are appended while ingest streams and renamed into place on commit,
+# so readers never see a partial entry.
+
+def _content_dir(content_hash: str) -> Path:
+    return Path(CACHE_DIR) / "content" / content_hash
+
+def _doc_ref(document_id: str) -> Path:
+    return Path(CACHE_DIR) / "by_doc" / document_id
+
+def _read_meta(content_hash: str) -> Dict[str, Any]:
+    meta_path = _content_dir(content_hash) / "meta.json"
+    if not meta_path.exists():
+        return {}
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_meta(content_hash: str, meta: Dict[str, Any]):
+    entry_dir = _content_dir(content_hash)
+    fd, tmp = tempfile.mkstemp(dir=entry_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, entry_dir / "meta.json")
+
+def lookup(content_hash: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Return what is cached for content_hash, or None on a miss.
+    Keys: has_vectors (bool), document_id (id of live vectors, or None),
+    user_id (owner of those vectors).
+    Use load_chapters / load_vectors to read the payloads.
+    """
+    if not CONTENT_CACHE_ENABLED or not content_hash:
+        return None
+    entry_dir = _content_dir(content_hash)
+    if not (entry_dir / "chapters.jsonl").exists():
+        return None
+    try:
+        meta = _read_meta(content_hash)
+        has_vectors = (entry_dir / "chunks.jsonl").exists() and (entry_dir / "vectors.f32").exists()
+        print(f"⚡ Content cache hit for {content_hash[:12]}")
+        return {"has_vectors": has_vectors, "document_id": meta.get("document_id"), "user_id": meta.get("user_id")}
+    except Exception as e:
+        print(f"Content cache read failed for {content_hash[:12]}: {e}")
+        return None
+
+def load_chapters(content_hash: str) -> list:
+    with open(_content_dir(content_hash) / "chapters.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def hash_for_document(document_id: str) -> Optional[str]:
+    """Content hash behind a document id, or None if not cached."""
+    if not CONTENT_CACHE_ENABLED:
+        return None
+    ref = _doc_ref(document_id)
+    if not ref.exists():
+        return None
+    return ref.read_text().strip()
+
+def chapters_for_document(document_id: str) -> Optional[list]:
+    """Cached chapters behind a document id, or None if not cached."""
+    try:
+        content_hash = hash_for_document(document_id)
+        if content_hash is None:
+            return None
+        return load_chapters(content_hash)
+    except Exception as e:
+        print(f"Content cache read failed for document {document_id}: {e}")
+        return None
+
+def load_vectors(content_hash: str):
+    """Return (chunks, vectors) where vectors is an (n, dim) float32 array."""
+    import numpy as np
+    entry_dir = _content_dir(content_hash)
+    with open(entry_dir / "chunks.jsonl", encoding="utf-8") as f:
+        chunks = [json.loads(line) for line in f]
+    dim = _read_meta(content_hash)["dim"]
+    vectors = np.fromfile(entry_dir / "vectors.f32", dtype=np.float32).reshape(-1, dim)
+    return chunks, vectors
+
+class CacheWriter:
+    """Appends a streaming ingest's chapters, chunks and vectors to the cache."""
+
+    def __init__(self, content_hash: Optional[str]):
+        self.enabled = CONTENT_CACHE_ENABLED and bool(content_hash)
+        self.content_hash = content_hash
+        self.dim = None
+        if not self.enabled:
+            return
+        self.entry_dir = _content_dir(content_hash)
+        self.entry_dir.mkdir(parents=True, exist_ok=True)
+        # Unique suffix so concurrent ingests of the same file don't interleave
+        self.suffix = f".{os.getpid()}.{id(self)}.tmp"
+        self._chapters = open(self.entry_dir / f"chapters.jsonl{self.suffix}", "w", encoding="utf-8")
+        self._chunks = open(self.entry_dir / f"chunks.jsonl{self.suffix}", "w", encoding="utf-8")
+        self._vectors = open(self.entry_dir / f"vectors.f32{self.suffix}", "wb")
+
+    def add_chapter(self, page: dict):
+        if self.enabled:
+            self._chapters.write(json.dumps(page) + "\n")
+
+    def add_batch(self, chunks: list, vectors):
+        if not self.enabled:
+            return
+        import numpy as np
+        array = np.asarray(vectors, dtype=np.float32)
+        self.dim = array.shape[1] if array.ndim == 2 else self.dim
+        for chunk in chunks:
+            self._chunks.write(json.dumps(chunk) + "\n")
+        self._vectors.write(array.tobytes())
+
+    def set_keywords(self, keywords: list):
+        """Fill in the keywords of the chunks added so far, in order (they are scored after the last batch)."""
+        if not self.enabled:
+            return
+        self._chunks.close()
+        pending = self.entry_dir / f"chunks.jsonl{self.suffix}"
+        rewritten = self.entry_dir / f"chunks.jsonl{self.suffix}.kw"
+        with open(pending, encoding="utf-8") as src, open(rewritten, "w", encoding="utf-8") as dst:
+            for line, words in zip(src, keywords):
+                chunk = json.loads(line)
+                chunk["metadata"]["keywords"] = words
+                dst.write(json.dumps(chunk) + "\n")
+        os.replace(rewritten, pending)
+        self._chunks = open(pending, "a", encoding="utf-8")
+
+    def commit_chapters(self):
+        """Publish the chapters once extraction finished, even if embedding later fails."""
+        if not self.enabled or self._chapters.closed:
+            return
+        self._chapters.close()
+        os.replace(self.entry_dir / f"chapters.jsonl{self.suffix}", self.entry_dir / "chapters.jsonl")
+
+    def commit(self, document_id: str, user_id: Optional[str] = None):
+        """Publish chunks and vectors and record document_id (owned by user_id) as their live copy in the vector DB."""
+        if not self.enabled:
+            return
+        self.commit_chapters()
+        self._chunks.close()
+        self._vectors.close()
+        if self.dim is None:
+            self.abort()
+            return
+        os.replace(self.entry_dir / f"chunks.jsonl{self.suffix}", self.entry_dir / "chunks.jsonl")
+        os.replace(self.entry_dir / f"vectors.f32{self.suffix}", self.entry_dir / "vectors.f32")
+        _write_meta(self.content_hash, {"dim": self.dim})
+        set_document(self.content_hash, document_id, user_id)
+
+    def abort(self):
+        if not self.enabled:
+            return
+        for handle in (self._chapters, self._chunks, self._vectors):
+            handle.close()
+        for name in ("chapters.jsonl", "chunks.jsonl", "vectors.f32"):
+            tmp = self.entry_dir / f"{name}{self.suffix}"
+            if tmp.exists():
+                tmp.unlink()
+
+def set_document(content_hash: str, document_id: str, user_id: Optional[str] = None):
+    if not CONTENT_CACHE_ENABLED or not content_hash:
+        return
+    _write_meta(content_hash, {**_read_meta(content_hash), "document_id": document_id, "user_id": user_id})
+    ref = _doc_ref(document_id)
+    ref.parent.mkdir(parents=True, exist_ok=True)
+    ref.write_text(content_hash)
+
+def forget_document(document_id: str):
+    """
+    Called once a document's vectors are deleted: the cached chapters, chunks
+    and vectors are kept, but no longer point at live vectors.
+    """
+    if not CONTENT_CACHE_ENABLED:
+        return
+    ref = _doc_ref(document_id)
+    if not ref.exists():
+        return
+    try:
+        content_hash = ref.read_text().strip()
+        meta = _read_meta(content_hash)
+        if meta.get("document_id") == document_id:
+            meta.pop("document_id")
+            meta.pop("user_id", None)
+            _write_meta(content_hash, meta)
+        ref.unlink()
+    except Exception as e:
+        print(f"Content cache invalidation failed for {document_id}: {e}")
+
+def clear():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
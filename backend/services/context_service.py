@@ -0,0 +1,136 @@
+from config import (
+    CONTEXT_CANDIDATES_CHAT, CONTEXT_CANDIDATES_SUMMARY, CONTEXT_MMR_LAMBDA,
+    CONTEXT_DUP_THRESHOLD, CONTEXT_TOKENS_CHAT, CONTEXT_TOKENS_SUMMARY
+)
+
+CANDIDATES = {"chat": CONTEXT_CANDIDATES_CHAT, "summary": CONTEXT_CANDIDATES_SUMMARY}
+TOKEN_BUDGET = {"chat": CONTEXT_TOKENS_CHAT, "summary": CONTEXT_TOKENS_SUMMARY}
+
+# Rank constant of the relevance term, as in reciprocal rank fusion: hybrid search
+# returns RRF order, whose scores are not comparable to cosine similarities
+RANK_K = 60
+
+def count_tokens(texts: list) -> list:
+    """Tokens per text with the embedding model's tokenizer, the unit chunks are sized in."""
+    from services.embedding_service import get_tokenizer
+    if not texts:
+        return []
+    encoded = get_tokenizer()(
+        texts, add_special_tokens=False, return_attention_mask=False, return_token_type_ids=False
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+def rank_relevance(ranks, k=RANK_K):
+    """Relevance from search rank, 1/(k + rank) scaled so the top hit scores 1."""
+    import numpy as np
+    return (k + 1) / (k + 1 + np.asarray(ranks, dtype=np.float32))
+
+def mmr_select(relevance, vectors, token_costs, budget, lambda_=CONTEXT_MMR_LAMBDA, dup_threshold=CONTEXT_DUP_THRESHOLD):
+    """
+    Maximal marginal relevance over candidates, packed to a token budget.
+    relevance comes from the search ranking (see rank_relevance); the vectors are
+    only compared with each other, for the diversity penalty.
+    Near-duplicates (cosine >= dup_threshold to an already selected candidate)
+    are dropped; candidates that no longer fit are skipped in favour of smaller ones.
+    Returns selected indices in selection order.
+    """
+    import numpy as np
+    vecs = np.asarray(vectors, dtype=np.float32)
+    if len(vecs) == 0:
+        return []
+    vecs = vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+    relevance = np.asarray(relevance, dtype=np.float32)
+    # Highest similarity of each candidate to anything already selected
+    max_sim = np.full(len(vecs), -1.0, dtype=np.float32)
+    available = np.ones(len(vecs), dtype=bool)
+    selected = []
+    used = 0
+
+    while available.any():
+        scores = lambda_ * relevance - (1 - lambda_) * np.maximum(max_sim, 0)
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        available[best] = False
+        if selected and max_sim[best] >= dup_threshold:
+            continue
+        if used + token_costs[best] > budget:
+            continue
+        selected.append(best)
+        used += token_costs[best]
+        max_sim = np.maximum(max_sim, vecs @ vecs[best])
+    return selected
+
+def merge_adjacent(chunks: list) -> list:
+    """
+    Merge selected chunks that are consecutive pieces of the same section
+    (same document, chapter, section and consecutive chunk_index).
+    Blocks keep the rank of their best member.
+    """
+    groups = {}
+    for rank, c in enumerate(chunks):
+        meta = c["metadata"]
+        key = (meta.get("document_id"), meta.get("chapter"), meta.get("section"))
+        groups.setdefault(key, []).append((rank, c))
+
+    blocks = []
+    for members in groups.values():
+        members.sort(key=lambda rc: (rc[1]["metadata"].get("chunk_index") is None, rc[1]["metadata"].get("chunk_index", 0)))
+        current = None
+        for rank, c in members:
+            index = c["metadata"].get("chunk_index")
+            if current is not None and index is not None and current["last_index"] == index - 1:
+                overlap = c["metadata"].get("overlap_chars", 0)
+                if overlap:
+                    # Continues a split paragraph: drop the repeated head and join directly
+                    current["parts"][-1] += c["content"][overlap:]
+                else:
+                    current["parts"].append(c["content"])
+                current["ids"].append(c["id"])
+                current["rank"] = min(current["rank"], rank)
+                current["score"] = max(current["score"], c["score"])
+                current["last_index"] = index
+                continue
+            current = {
+                "rank": rank, "parts": [c["content"]], "ids": [c["id"]], "score": c["score"],
+                "metadata": c["metadata"], "last_index": index
+            }
+            blocks.append(current)
+
+    blocks.sort(key=lambda b: b["rank"])
+    return [
+        {
+            "id": b["ids"][0],
+            "chunk_ids": b["ids"],
+            "score": b["score"],
+            "content": "\n\n".join(b["parts"]),
+            "metadata": b["metadata"]
+        }
+        for b in blocks
+    ]
+
+def assemble_context(points, mode: str = "chat") -> list:
+    """
+    Turn over-fetched search results (with vectors, best first) into diversified,
+    merged context chunks that fit the mode's token budget.
+    """
+    candidates = []
+    vectors = []
+    ranks = []
+    for rank, r in enumerate(points):
+        payload = getattr(r, 'payload', {}) or {}
+        text = payload.get("text", "")
+        vector = getattr(r, 'vector', None)
+        if not text or vector is None:
+            continue
+        candidates.append({
+            "id": getattr(r, 'id', 'unknown'),
+            "score": getattr(r, 'score', 0.0),
+            "content": text,
+            "metadata": {k: v for k, v in payload.items() if k != "text"}
+        })
+        vectors.append(vector)
+        ranks.append(rank)
+
+    costs = count_tokens([c["content"] for c in candidates])
+    order = mmr_select(rank_relevance(ranks), vectors, costs, TOKEN_BUDGET.get(mode, CONTEXT_TOKENS_CHAT))
+    return merge_adjacent([candidates[i] for i in order])
@@ -1,17 +1,250 @@
 # Service for generating embeddings
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from config import (
+    EMBED_BATCH_SIZE, EMBED_MAX_BATCH_TOKENS, EMBED_THREADS, EMBED_NORMALIZE,
+    EMBED_BACKEND, EMBED_PARITY_THRESHOLD, EMBED_PARITY_CHECK, EMBED_PACK_WAIT_MS, CACHE_DIR
+)
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Stored on every chunk; vectors are only comparable within one version.
+# ONNX backends are not part of it: get_model() only keeps them when they match torch.
+EMBEDDING_VERSION = f"{MODEL_NAME}:{'norm' if EMBED_NORMALIZE else 'raw'}"
+
+# ONNX exports shipped in the model repo, per backend
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_qint8_avx2.onnx",
+}
+
+# Fixture corpus for the backend parity check
+PARITY_CORPUS = [
+    "What is generative AI?",
+    "Invoice 4471-B was rejected because the purchase order number was missing.",
+    "# Chapter 3: Installation\n\nUnpack the archive and run the setup script as administrator.",
+    "The transformer architecture relies on self-attention to weigh tokens against each other.",
+    "Error code E-1023 indicates that the pump pressure sensor is disconnected.",
+    "Quarterly revenue grew 12% year over year, driven mainly by subscription renewals.",
+    "Section 2.4 describes the safety procedures for handling lithium batteries.",
+    "Table: Model | Params | Latency\nMiniLM | 22M | 4ms",
+]
+
+# Measured parity per ONNX file and library versions, so startup does not load torch every time
+PARITY_RESULTS_PATH = os.path.join(CACHE_DIR, "embed_parity.json")
 
 _model = None
+_tokenizer = None
+# Concurrent ingest jobs must not load the model or tokenizer twice
+_model_lock = threading.Lock()
+_tokenizer_lock = threading.Lock()
+
+def _load_model(backend: str):
+    from sentence_transformers import SentenceTransformer
+    if backend == "torch":
+        return SentenceTransformer(MODEL_NAME)
+    if backend in ONNX_FILES:
+        # Needs optimum[onnxruntime]; ONNX Runtime picks its own thread count
+        return SentenceTransformer(
+            MODEL_NAME,
+            backend="onnx",
+            model_kwargs={"file_name": ONNX_FILES[backend]}
+        )
+    raise ValueError(f"Unknown EMBED_BACKEND '{backend}': use 'torch', 'onnx' or 'onnx-int8'")
+
+def check_parity(model, reference=None, texts=PARITY_CORPUS, threshold=EMBED_PARITY_THRESHOLD):
+    """
+    Compare model against the torch reference on the fixture corpus.
+    Returns (passed, min_cosine).
+    """
+    import numpy as np
+    if reference is None:
+        reference = _load_model("torch")
+    a = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    b = reference.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    min_cosine = float(np.min(np.sum(a * b, axis=1)))
+    return min_cosine >= threshold, min_cosine
+
+def _parity_key(backend: str) -> str:
+    from importlib import metadata
+    versions = []
+    for package in ("sentence-transformers", "transformers", "optimum", "onnxruntime", "torch"):
+        try:
+            versions.append(f"{package}=={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            pass
+    return " ".join([MODEL_NAME, ONNX_FILES[backend], *versions])
+
+def cached_parity(model, backend: str) -> float:
+    """Min cosine of an ONNX backend against torch, measured once and kept in PARITY_RESULTS_PATH."""
+    key = _parity_key(backend)
+    try:
+        with open(PARITY_RESULTS_PATH) as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        results = {}
+    if key not in results:
+        results[key] = check_parity(model)[1]
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{PARITY_RESULTS_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(results, f, indent=1)
+        os.replace(tmp_path, PARITY_RESULTS_PATH)
+    return results[key]
 
 def get_model():
     global _model
     if _model is None:
-        from sentence_transformers import SentenceTransformer
-        print("🔄 Loading embedding model...")
-        _model = SentenceTransformer("all-MiniLM-L6-v2")
+        with _model_lock:
+            if _model is None:
+                print(f"🔄 Loading embedding model ({EMBED_BACKEND})...")
+                if EMBED_THREADS > 0:
+                    import torch
+                    torch.set_num_threads(EMBED_THREADS)
+                model = _load_model(EMBED_BACKEND)
+                if EMBED_BACKEND != "torch" and EMBED_PARITY_CHECK:
+                    min_cosine = cached_parity(model, EMBED_BACKEND)
+                    if min_cosine >= EMBED_PARITY_THRESHOLD:
+                        print(f"✅ {EMBED_BACKEND} parity check passed (min cosine {min_cosine:.4f})")
+                    else:
+                        print(f"⚠️ {EMBED_BACKEND} parity check failed (min cosine {min_cosine:.4f} < {EMBED_PARITY_THRESHOLD}), falling back to torch")
+                        model = _load_model("torch")
+                _model = model
     return _model
 
-def embed_chunks(chunks):
+def get_tokenizer():
+    """The model's fast word-piece tokenizer, loaded without the weights (used for chunking)."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(f"sentence-transformers/{MODEL_NAME}", use_fast=True)
+    return _tokenizer
+
+def embedding_dimension() -> int:
+    """Vector size of the loaded model; collections are created with it."""
+    return get_model().get_sentence_embedding_dimension()
+
+def token_lengths(texts):
+    """Token count of each text as the model sees it (after truncation)."""
+    model = get_model()
+    encoded = model.tokenizer(
+        list(texts),
+        add_special_tokens=True,
+        truncation=True,
+        max_length=model.max_seq_length,
+        return_attention_mask=False,
+        return_token_type_ids=False
+    )
+    return [len(ids) for ids in encoded["input_ids"]]
+
+def length_buckets(lengths, batch_size=EMBED_BATCH_SIZE, max_batch_tokens=EMBED_MAX_BATCH_TOKENS):
+    """
+    Group indices of similar length into batches, shortest first.
+    A batch closes at batch_size rows or when its padded size
+    (rows x longest row) would exceed max_batch_tokens.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    for i in order:
+        # Sorted ascending, so lengths[i] is the longest row if added
+        if current and (len(current) >= batch_size or (len(current) + 1) * lengths[i] > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+def encode(texts, batch_size=EMBED_BATCH_SIZE, normalize=EMBED_NORMALIZE):
+    """
+    Encode texts in length-bucketed batches to minimise padding.
+    Returns an (n, dim) float32 NumPy array in the original order.
+    """
+    import numpy as np
     model = get_model()
+    texts = list(texts)
+    dim = model.get_sentence_embedding_dimension()
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    for batch in length_buckets(token_lengths(texts), batch_size=batch_size):
+        out[batch] = model.encode(
+            [texts[i] for i in batch],
+            batch_size=len(batch),
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+            show_progress_bar=False
+        )
+    return out
+
+def embed_chunks(chunks):
+    vectors = encode(chunks)
     print("embeddings created Successfully")
-    return model.encode(chunks).tolist()
+    return vectors
+
+# --- Packed encoding across ingest jobs ---------------------------------------
+
+_pack_queue = None
+_pack_lock = threading.Lock()
+
+def _pack_worker():
+    """Encode queued requests together: everything that arrives within EMBED_PACK_WAIT_MS of the first."""
+    while True:
+        requests = [_pack_queue.get()]
+        deadline = time.monotonic() + EMBED_PACK_WAIT_MS / 1000
+        while True:
+            try:
+                requests.append(_pack_queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        texts = [text for batch, _ in requests for text in batch]
+        try:
+            vectors = encode(texts)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            continue
+        offset = 0
+        for batch, future in requests:
+            future.set_result(vectors[offset:offset + len(batch)])
+            offset += len(batch)
+
+def embed_packed(texts):
+    """
+    Same result as encode(texts), computed on one shared encoder thread.
+    Batches from concurrent ingest jobs are length-bucketed together, so the
+    short tail batches of many documents share forward passes and jobs do not
+    compete for torch threads.
+    """
+    global _pack_queue
+    with _pack_lock:
+        if _pack_queue is None:
+            _pack_queue = queue.Queue()
+            threading.Thread(target=_pack_worker, name="embed-pack", daemon=True).start()
+    future = Future()
+    _pack_queue.put((list(texts), future))
+    return future.result()
 
+if __name__ == "__main__":
+    # Compare every backend against torch: parity and single-query latency
+    reference = _load_model("torch")
+    for backend in ["torch", *ONNX_FILES]:
+        try:
+            model = _load_model(backend)
+        except Exception as e:
+            print(f"{backend}: unavailable ({e})")
+            continue
+        passed, min_cosine = check_parity(model, reference=reference)
+        start = time.perf_counter()
+        for text in PARITY_CORPUS * 10:
+            model.encode([text])
+        per_query_ms = (time.perf_counter() - start) * 1000 / (len(PARITY_CORPUS) * 10)
+        print(f"{backend}: min cosine {min_cosine:.4f} ({'ok' if passed else 'FAIL'}), {per_query_ms:.2f} ms/query")
@@ -0,0 +1,261 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import INGEST_WORKERS, INGEST_QUEUE_SIZE
+from services.ocr_service import write_job
+from services.job_store import get_job_store, FINISHED_STATUSES
+
+# Bounded worker pool for ingestion jobs
+_executor = None
+_pending = 0
+_lock = threading.Lock()
+# Notified whenever a job gives its queue slot back (batch dispatchers wait on it)
+_slot_free = threading.Condition(_lock)
+
+# Records of jobs and batches this process still owns are touched this often; an
+# unfinished record left untouched for JOB_STALE_SECONDS lost its process (it exited)
+# and is recovered
+JOB_HEARTBEAT_SECONDS = 30
+JOB_STALE_SECONDS = 4 * JOB_HEARTBEAT_SECONDS
+_live = set()
+_heartbeat = None
+INTERRUPTED = "Server stopped before the job finished"
+
+class QueueFullError(Exception):
+    """Raised when the ingest queue has no free slots."""
+    pass
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        print(f"🔄 Starting ingest pool with {INGEST_WORKERS} workers...")
+        _executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+    return _executor
+
+def _beat():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with _lock:
+            live = list(_live)
+        for job_id in live:
+            try:
+                write_job(job_id, {})
+            except Exception as e:
+                print(f"Heartbeat for job {job_id} failed: {e}")
+
+def _own(job_id: str):
+    """Keep job_id's record fresh until _disown, so it is not taken for orphaned."""
+    global _heartbeat
+    with _lock:
+        _live.add(job_id)
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_beat, name="job-heartbeat", daemon=True)
+            _heartbeat.start()
+
+def _disown(job_id: str):
+    with _lock:
+        _live.discard(job_id)
+
+def _release(on_finish=None):
+    global _pending
+    with _lock:
+        _pending -= 1
+        if on_finish is not None:
+            on_finish()
+        _slot_free.notify_all()
+
+def _start(job_id: str, fn, args, on_finish=None):
+    """Run fn(*args) on the pool under job_id. The caller has already taken a queue slot."""
+    def _run():
+        try:
+            write_job(job_id, {"status": "running", "progress": 5})
+            document_id = fn(*args)
+            if document_id is None:
+                raise ValueError("No document was produced")
+            write_job(job_id, {"status": "completed", "progress": 100, "document_id": document_id})
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            write_job(job_id, {"status": "failed", "error": str(e)})
+        finally:
+            _disown(job_id)
+            _release(on_finish)
+
+    _own(job_id)
+    try:
+        get_executor().submit(_run)
+    except Exception:
+        _disown(job_id)
+        _release(on_finish)
+        raise
+
+def submit_job(job_id: str, fn, *args, **meta):
+    """
+    Queue fn(*args) on the ingest pool and track it under job_id.
+    Extra keyword arguments are stored on the job record (e.g. user_id, filename).
+    Raises QueueFullError when INGEST_QUEUE_SIZE jobs are already waiting or running.
+    """
+    global _pending
+    with _lock:
+        if _pending >= INGEST_QUEUE_SIZE:
+            raise QueueFullError(f"Ingest queue is full ({INGEST_QUEUE_SIZE} jobs)")
+        _pending += 1
+
+    try:
+        write_job(job_id, {"status": "queued", "progress": 0, **meta})
+    except Exception:
+        # e.g. the job store is locked or the disk is full: give the slot back
+        _release()
+        raise
+    _start(job_id, fn, args)
+    return job_id
+
+def queue_full() -> bool:
+    """Whether submit_job would raise QueueFullError right now (checked before spooling an upload)."""
+    with _lock:
+        return _pending >= INGEST_QUEUE_SIZE
+
+def submit_batch(batch_id: str, jobs, setup=None, **meta):
+    """
+    Queue many jobs as one batch, tracked under batch_id.
+    jobs are (job_id, fn, args, job_meta) tuples, started in the given order;
+    meta goes on the batch record and on every job record.
+
+    A batch is never answered with QueueFullError: a dispatcher thread calls
+    setup() once (e.g. to load models), then starts jobs as queue slots free up.
+    It keeps at most INGEST_WORKERS of its jobs queued or running, which is enough
+    to fill the pool and leaves the other slots to single uploads.
+    """
+    jobs = list(jobs)
+    write_job(batch_id, {
+        "status": "queued", "kind": "batch", "progress": 0,
+        "total": len(jobs), "job_ids": [job[0] for job in jobs], **meta
+    })
+    for job_id, _, _, job_meta in jobs:
+        write_job(job_id, {"status": "queued", "progress": 0, "batch_id": batch_id, **meta, **job_meta})
+
+    in_flight = [0]
+    def finished():
+        in_flight[0] -= 1
+
+    def dispatch():
+        try:
+            run_batch()
+        finally:
+            _disown(batch_id)
+
+    def run_batch():
+        global _pending
+        if setup is not None:
+            try:
+                setup()
+            except Exception as e:
+                # Jobs load what they need themselves
+                print(f"Batch {batch_id} setup failed: {e}")
+        write_job(batch_id, {"status": "running"})
+        for job_id, fn, args, _ in jobs:
+            with _slot_free:
+                _slot_free.wait_for(lambda: _pending < INGEST_QUEUE_SIZE and in_flight[0] < INGEST_WORKERS)
+                _pending += 1
+                in_flight[0] += 1
+            try:
+                _start(job_id, fn, args, on_finish=finished)
+            except Exception as e:
+                write_job(job_id, {"status": "failed", "error": str(e)})
+        with _slot_free:
+            _slot_free.wait_for(lambda: in_flight[0] == 0)
+        write_job(batch_id, {"status": "completed", "progress": 100})
+
+    _own(batch_id)
+    threading.Thread(target=dispatch, name=f"batch-{batch_id[:8]}", daemon=True).start()
+    return batch_id
+
+def _recover_batch(store, batch_id: str, job_ids) -> dict:
+    """Fail the unfinished jobs of a batch whose dispatcher is gone and complete the batch."""
+    jobs = store.get_many(job_ids)
+    for job_id in job_ids:
+        if jobs.get(job_id, {}).get("status") not in FINISHED_STATUSES:
+            write_job(job_id, {"status": "failed", "error": INTERRUPTED})
+    return write_job(batch_id, {"status": "completed", "progress": 100})
+
+def _is_orphaned(job: dict) -> bool:
+    """
+    Unfinished and not touched for JOB_STALE_SECONDS. Jobs of a batch only count
+    through their batch: the ones still waiting for a slot get no heartbeat.
+    """
+    return (job.get("status") not in FINISHED_STATUSES and not job.get("batch_id")
+            and time.time() - job.get("updated_at", 0) > JOB_STALE_SECONDS)
+
+def _recover(store, job_id: str, job: dict) -> dict:
+    if job.get("kind") == "batch":
+        return _recover_batch(store, job_id, job["job_ids"])
+    return write_job(job_id, {"status": "failed", "error": INTERRUPTED})
+
+def recover_jobs() -> int:
+    """
+    Recover jobs and batches left unfinished by a server process that exited
+    (they were queued or running in it). Called at startup; get_job and get_batch
+    recover records that go stale later. Returns the number recovered.
+    """
+    store = get_job_store()
+    orphaned = [job for job in store.list_unfinished() if _is_orphaned(job)]
+    for job in orphaned:
+        _recover(store, job["job_id"], job)
+    if orphaned:
+        print(f"⚠️ Marked {len(orphaned)} interrupted job(s) and batch(es) as finished")
+    return len(orphaned)
+
+def get_job(job_id: str):
+    store = get_job_store()
+    job = store.get(job_id)
+    if job is not None and _is_orphaned(job):
+        job = _recover(store, job_id, job)
+    return job
+
+def list_jobs(user_id: str, limit: int = 50):
+    return get_job_store().list_by_user(user_id, limit=limit)
+
+def get_batch(batch_id: str):
+    """
+    A batch record with its files' status and aggregate progress, or None.
+    Failed files count as done for progress; see counts for how many failed.
+    pages_text_layer / pages_ocr add up how each file's pages were converted.
+    """
+    store = get_job_store()
+    batch = store.get(batch_id)
+    if batch is None or batch.get("kind") != "batch":
+        return None
+    if _is_orphaned(batch):
+        batch = _recover(store, batch_id, batch)
+    counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+    files = []
+    done = 0
+    chunks_indexed = 0
+    pages = {"pages_text_layer": 0, "pages_ocr": 0}
+    jobs = store.get_many(batch["job_ids"])
+    for job_id in batch["job_ids"]:
+        job = jobs.get(job_id) or {"status": "failed", "error": "job record expired"}
+        status = job.get("status", "queued")
+        counts[status] = counts.get(status, 0) + 1
+        progress = 100 if status in FINISHED_STATUSES else job.get("progress", 0)
+        done += progress
+        chunks_indexed += job.get("chunks_indexed", 0)
+        for key in pages:
+            pages[key] += job.get(key, 0)
+        files.append({
+            "job_id": job_id,
+            "filename": job.get("filename"),
+            "status": status,
+            "progress": progress,
+            "chunks_indexed": job.get("chunks_indexed", 0),
+            "document_id": job.get("document_id"),
+            "error": job.get("error")
+        })
+    total = len(files)
+    return {
+        **batch,
+        "progress": 100 if batch.get("status") == "completed" else (done // total if total else 0),
+        "counts": counts,
+        "chunks_indexed": chunks_indexed,
+        **pages,
+        "files": files
+    }
@@ -0,0 +1,194 @@
+import json
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from config import JOB_STORE, JOB_DB_PATH, JOB_TTL_SECONDS
+
+# Process-local job storage used by the memory backend
+JOBS: Dict[str, Dict[str, Any]] = {}
+
+FINISHED_STATUSES = ("completed", "failed")
+
+class JobStore(ABC):
+    """Interface for job status storage."""
+
+    @abstractmethod
+    def write(self, job_id: str, data: Dict) -> Dict:
+        """Atomically merge data into the job record and return the result."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        """The job record, or None."""
+
+    @abstractmethod
+    def get_many(self, job_ids: List[str]) -> Dict[str, Dict]:
+        """Records of the given jobs that exist, by job id."""
+
+    @abstractmethod
+    def list_unfinished(self) -> List[Dict]:
+        """Every job that is neither completed nor failed."""
+
+    @abstractmethod
+    def list_by_user(self, user_id: str, limit: int = 50) -> List[Dict]:
+        """Most recently updated jobs for a user, newest first."""
+
+    @abstractmethod
+    def expire(self) -> int:
+        """Drop finished jobs older than the TTL. Returns the number removed."""
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self, jobs: Dict[str, Dict[str, Any]], ttl: int = JOB_TTL_SECONDS):
+        self.jobs = jobs
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def write(self, job_id, data):
+        with self._lock:
+            job = {**self.jobs.get(job_id, {}), **data, "updated_at": time.time()}
+            self.jobs[job_id] = job
+            return dict(job)
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def get_many(self, job_ids):
+        with self._lock:
+            return {k: dict(self.jobs[k]) for k in job_ids if k in self.jobs}
+
+    def list_unfinished(self):
+        with self._lock:
+            return [{"job_id": k, **v} for k, v in self.jobs.items() if v.get("status") not in FINISHED_STATUSES]
+
+    def list_by_user(self, user_id, limit=50):
+        with self._lock:
+            jobs = [{"job_id": k, **v} for k, v in self.jobs.items() if v.get("user_id") == user_id]
+        jobs.sort(key=lambda j: j.get("updated_at", 0), reverse=True)
+        return jobs[:limit]
+
+    def expire(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            stale = [k for k, v in self.jobs.items()
+                     if v.get("status") in FINISHED_STATUSES and v.get("updated_at", 0) < cutoff]
+            for k in stale:
+                del self.jobs[k]
+        return len(stale)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store shared by every worker process on the host.
+    Uses WAL mode so status polls never block pipeline writes.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH, ttl: int = JOB_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._last_expire = 0.0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                status TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, updated_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, updated_at);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def write(self, job_id, data):
+        conn = self._conn()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so read-merge-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            job = {**(json.loads(row[0]) if row else {}), **data, "updated_at": now}
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, user_id, status, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, job.get("user_id"), job.get("status"), json.dumps(job), now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        # Opportunistic cleanup, at most once a minute per process
+        if now - self._last_expire > 60:
+            self._last_expire = now
+            self.expire()
+        return job
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, job_ids):
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(job_ids), 900):
+            batch = job_ids[i:i + 900]
+            placeholders = ",".join("?" for _ in batch)
+            found.update(
+                (job_id, json.loads(data)) for job_id, data in self._conn().execute(
+                    f"SELECT job_id, data FROM jobs WHERE job_id IN ({placeholders})", batch
+                )
+            )
+        return found
+
+    def list_unfinished(self):
+        placeholders = ",".join("?" for _ in FINISHED_STATUSES)
+        rows = self._conn().execute(
+            f"SELECT job_id, data FROM jobs WHERE status NOT IN ({placeholders})", FINISHED_STATUSES
+        ).fetchall()
+        return [{"job_id": job_id, **json.loads(data)} for job_id, data in rows]
+
+    def list_by_user(self, user_id, limit=50):
+        rows = self._conn().execute(
+            "SELECT job_id, data FROM jobs WHERE user_id = ? ORDER BY updated_at DESC LIMIT ?",
+            (user_id, limit)
+        ).fetchall()
+        return [{"job_id": job_id, **json.loads(data)} for job_id, data in rows]
+
+    def expire(self):
+        cutoff = time.time() - self.ttl
+        placeholders = ",".join("?" for _ in FINISHED_STATUSES)
+        cur = self._conn().execute(
+            f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+            (*FINISHED_STATUSES, cutoff)
+        )
+        return cur.rowcount
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if JOB_STORE == "sqlite":
+                    print(f"🔄 Using SQLite job store at {JOB_DB_PATH}")
+                    _store = SQLiteJobStore(JOB_DB_PATH)
+                elif JOB_STORE == "memory":
+                    _store = MemoryJobStore(JOBS)
+                else:
+                    raise ValueError(f"Unknown JOB_STORE '{JOB_STORE}': use 'memory' or 'sqlite'")
+    return _store
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from typing import AsyncIterator
+import random
+import threading
+import time
+from config import (
+    GEMINI_API_KEY, GEMINI_MODEL, LLM_PROVIDER,
+    FAKE_LLM_LATENCY_MS, FAKE_LLM_TOKENS, FAKE_LLM_TOKENS_PER_SEC,
+    FAKE_LLM_ERROR_RATE, FAKE_LLM_SEED
+)
+
+# LLM providers used by rag_service. Rate limits surface as
+# google.api_core.exceptions.ResourceExhausted from every provider.
+
+class LLMProvider(ABC):
+    """Interface for text generation backends."""
+
+    @abstractmethod
+    def generate(self, prompt: str) -> str:
+        """The full answer to prompt."""
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Async iterator of text pieces (implement as an async generator)."""
+
+
+class GeminiProvider(LLMProvider):
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        import google.generativeai as genai
+        print("🔄 Initializing Gemini AI...")
+        genai.configure(api_key=GEMINI_API_KEY)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    async def stream(self, prompt):
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            text = chunk.text
+            if text:
+                yield text
+
+
+FAKE_VOCABULARY = (
+    "the document describes system data model section results process method "
+    "analysis table value report design user performance chapter summary "
+    "configuration error example overview detail page key concept component"
+).split()
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic offline stand-in. The answer depends only on the prompt;
+    latency, token rate and ResourceExhausted injection are configurable.
+    """
+
+    def __init__(self, latency_ms=FAKE_LLM_LATENCY_MS, tokens=FAKE_LLM_TOKENS,
+                 tokens_per_sec=FAKE_LLM_TOKENS_PER_SEC, error_rate=FAKE_LLM_ERROR_RATE, seed=FAKE_LLM_SEED):
+        self.latency = latency_ms / 1000
+        self.tokens = tokens
+        self.token_interval = 1 / tokens_per_sec if tokens_per_sec > 0 else 0
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _maybe_fail(self):
+        with self._rng_lock:
+            fail = self._rng.random() < self.error_rate
+        if fail:
+            from google.api_core import exceptions
+            raise exceptions.ResourceExhausted("Injected rate limit (fake provider)")
+
+    def _tokens(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        words = [FAKE_VOCABULARY[digest[i % len(digest)] % len(FAKE_VOCABULARY)] for i in range(self.tokens)]
+        return [w + " " for w in words[:-1]] + [words[-1] + "."] if words else []
+
+    def generate(self, prompt):
+        self._maybe_fail()
+        tokens = self._tokens(prompt)
+        time.sleep(self.latency + self.token_interval * len(tokens))
+        return "".join(tokens)
+
+    async def stream(self, prompt):
+        self._maybe_fail()
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(self._tokens(prompt)):
+            if i and self.token_interval:
+                await asyncio.sleep(self.token_interval)
+            yield token
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_llm_provider() -> LLMProvider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if LLM_PROVIDER == "gemini":
+                    _provider = GeminiProvider()
+                elif LLM_PROVIDER == "fake":
+                    print("🔄 Using fake LLM provider")
+                    _provider = FakeProvider()
+                else:
+                    raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}': use 'gemini' or 'fake'")
+    return _provider
@@ -1,62 +1,188 @@
 from pathlib import Path
-import shutil
+import threading
 import time
 import zipfile
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
+from services.job_store import get_job_store
+from config import (
+    OCR_WORKERS, OCR_PAGES_PER_RANGE, OCR_PARALLEL_MIN_PAGES,
+    ADAPTIVE_OCR, OCR_TEXT_MIN_CHARS, OCR_TEXT_MIN_QUALITY, OCR_MIN_TEXT_RUN,
+    CHAPTER_ARCHIVE_DIR
+)
 
+# Global OCR model (load once!)
+OCR_MODEL = None
+# Converter for pages with an embedded text layer (no OCR)
+TEXT_MODEL = None
 
+# Ingest jobs running side by side share one load of each converter
+_OCR_LOCK = threading.Lock()
 
-# Global job storage (production: use Redis)
-JOBS: Dict[str, Dict[str, Any]] = {}
+# Process pool for page-range conversion; each worker holds its own converter
+_OCR_POOL = None
 
-# Global OCR model (load once!)
-OCR_MODEL = None
+def _build_converter(do_ocr: bool):
+    from docling.document_converter import DocumentConverter
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+    from docling.document_converter import PdfFormatOption
 
-def init_ocr():
-    global OCR_MODEL
-    if OCR_MODEL is None:
-        from docling.document_converter import DocumentConverter
-        from docling.datamodel.base_models import InputFormat
-        from docling.datamodel.pipeline_options import PdfPipelineOptions
-        from docling.document_converter import PdfFormatOption
-        print("🔄 Loading Docling (takes a moment)...")
-        
-        pipeline_options = PdfPipelineOptions()
-        pipeline_options.do_ocr = True
-        pipeline_options.do_table_structure = True
-        
-        OCR_MODEL = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-            }
-        )
-        print("✅ Docling ready!")
-    return OCR_MODEL
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.do_ocr = do_ocr
+    pipeline_options.do_table_structure = True
+    
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+        }
+    )
+
+def init_ocr(do_ocr: bool = True):
+    """Return the shared converter, with OCR enabled or text-layer only."""
+    global OCR_MODEL, TEXT_MODEL
+    with _OCR_LOCK:
+        if do_ocr and OCR_MODEL is None:
+            print("🔄 Loading Docling (takes a moment)...")
+            OCR_MODEL = _build_converter(do_ocr=True)
+            print("✅ Docling ready!")
+        if not do_ocr and TEXT_MODEL is None:
+            print("🔄 Loading Docling text-layer converter...")
+            TEXT_MODEL = _build_converter(do_ocr=False)
+            print("✅ Docling text-layer converter ready!")
+    return OCR_MODEL if do_ocr else TEXT_MODEL
 
 def write_job(job_id: str, data: Dict):
-    JOBS[job_id] = {**JOBS.get(job_id, {}), **data}
+    return get_job_store().write(job_id, data)
+
+def get_ocr_pool():
+    global _OCR_POOL
+    if _OCR_POOL is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        print(f"🔄 Starting OCR pool with {OCR_WORKERS} processes...")
+        # spawn: torch/Docling state is not fork-safe
+        _OCR_POOL = ProcessPoolExecutor(
+            max_workers=OCR_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_ocr
+        )
+    return _OCR_POOL
+
+def count_pdf_pages(pdf_path: str) -> int:
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def text_layer_quality(text: str) -> float:
+    """Share of characters that look like real text rather than a broken font mapping."""
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return 0.0
+    good = sum(1 for c in chars if c.isprintable() and c != "\ufffd" and not 0xE000 <= ord(c) <= 0xF8FF)
+    return good / len(chars)
+
+def scan_text_layer(pdf_path: str) -> list[bool]:
+    """
+    Pre-scan each page's embedded text layer.
+    Returns one flag per page: True when the page needs OCR (image-only or garbled).
+    """
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(pdf_path)
+    needs_ocr = []
+    try:
+        for i in range(len(pdf)):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+            usable = (
+                len(text.strip()) >= OCR_TEXT_MIN_CHARS
+                and text_layer_quality(text) >= OCR_TEXT_MIN_QUALITY
+            )
+            needs_ocr.append(not usable)
+    finally:
+        pdf.close()
+    return needs_ocr
+
+def ocr_segments(needs_ocr: list[bool]) -> list[tuple[int, int, bool]]:
+    """
+    Group pages into inclusive (start, end, do_ocr) runs.
+    Short text-layer runs between OCR pages are folded into OCR so a
+    mostly-scanned document is not split into many tiny conversions.
+    """
+    runs = []
+    for page, flag in enumerate(needs_ocr, start=1):
+        if runs and runs[-1][2] == flag:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page, flag])
+
+    for run in runs:
+        short = run[1] - run[0] + 1 < OCR_MIN_TEXT_RUN
+        if not run[2] and short and len(runs) > 1:
+            run[2] = True
+
+    merged = []
+    for start, end, flag in runs:
+        if merged and merged[-1][2] == flag:
+            merged[-1] = (merged[-1][0], end, flag)
+        else:
+            merged.append((start, end, flag))
+    return merged
+
+def page_ranges(start: int, end: int, pages_per_range: int) -> list[tuple[int, int]]:
+    """Split start..end into inclusive (start, end) ranges."""
+    return [
+        (s, min(s + pages_per_range - 1, end))
+        for s in range(start, end + 1, pages_per_range)
+    ]
+
+def _convert_range(pdf_path: str, start: int, end: int, do_ocr: bool = True) -> dict:
+    """Worker entry point: convert one page range and return the document as a dict."""
+    converter = init_ocr(do_ocr)
+    result = converter.convert(pdf_path, page_range=(start, end))
+    return result.document.export_to_dict()
 
-def export_chapters_final(result, output_dir: Path) -> tuple[str, list]:
+def convert_parallel(pdf_path: str, segments: list[tuple[int, int, bool]], job_id: str) -> list:
+    """Convert page ranges on the OCR pool and return DoclingDocuments in page order."""
+    from docling_core.types.doc import DoclingDocument
+    ranges = [
+        (start, end, do_ocr)
+        for seg_start, seg_end, do_ocr in segments
+        for start, end in page_ranges(seg_start, seg_end, OCR_PAGES_PER_RANGE)
+    ]
+    print(f"📄 Splitting {segments[-1][1]} pages into {len(ranges)} ranges across {OCR_WORKERS} workers")
+    pool = get_ocr_pool()
+    futures = [pool.submit(_convert_range, pdf_path, start, end, do_ocr) for start, end, do_ocr in ranges]
+
+    documents = []
+    for i, future in enumerate(futures):
+        documents.append(DoclingDocument.model_validate(future.result()))
+        write_job(job_id, {"status": "running", "progress": 10 + int(40 * (i + 1) / len(futures))})
+    return documents
+
+def iter_chapters(documents: list):
+    """
+    Walk converted documents (in page order) as one item stream and yield
+    (chapter_name, markdown_text) at each level-0 heading, so chapters
+    continue across page-range boundaries.
+    """
     from docling_core.types.doc import DocItemLabel, TableItem
-    doc = result.document
     current_chapter_name = "Introduction"
     current_content = []
     chapter_count = 0
-    
-    full_markdown_content = []
-    generated_chapters_data = []
 
-    def save_chapter(index, name, content):
-        clean_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
-        filename = f"{index:02d}_{clean_name[:50]}.md"
-        path = output_dir / filename
-        text_content = "".join(content)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(text_content)
-        print(f"Created: {filename}")
-        return filename, text_content
-
-    for item, level in doc.iterate_items():
+    def iterate_all_items():
+        for doc in documents:
+            yield from doc.iterate_items()
+
+    for item, level in iterate_all_items():
         # Check for heading labels
         label_str = str(item.label)
         is_heading = "heading" in label_str.lower()
@@ -64,10 +190,8 @@ def export_chapters_final(result, output_dir: Path) -> tuple[str, list]:
         # Split at the top-most level (Level 0)
         if is_heading and level == 0:
             if current_content:
-                fname, text = save_chapter(chapter_count, current_chapter_name, current_content)
+                yield current_chapter_name, "".join(current_content)
                 chapter_count += 1
-                full_markdown_content.append(text)
-                generated_chapters_data.append({"filename": fname, "content": text, "name": current_chapter_name})
 
             current_chapter_name = getattr(item, 'text', f"Chapter_{chapter_count}").strip()
             current_content = [f"# {current_chapter_name}\n\n"]
@@ -89,57 +213,120 @@ def export_chapters_final(result, output_dir: Path) -> tuple[str, list]:
                 if text:
                     current_content.append(f"{text}\n\n")
 
-    # Save final chapter
+    # Final chapter
     if current_content:
-        fname, text = save_chapter(chapter_count, current_chapter_name, current_content)
+        yield current_chapter_name, "".join(current_content)
+
+def chapter_filename(index: int, name: str) -> str:
+    clean_name = "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
+    return f"{index:02d}_{clean_name[:50]}.md"
+
+def export_chapters_final(result, output_dir: Path | None = None, documents: list | None = None) -> tuple[str, list]:
+    """
+    Split a converted document into chapters at level-0 headings.
+    When documents is given (ordered page-range results), they are exported as one document.
+    Chapters stay in memory; pass output_dir to also write them as .md files.
+    """
+    if documents is None:
+        documents = [result.document]
+    full_markdown_content = []
+    generated_chapters_data = []
+
+    for index, (name, text) in enumerate(iter_chapters(documents)):
+        fname = chapter_filename(index, name)
+        if output_dir is not None:
+            with open(output_dir / fname, "w", encoding="utf-8") as f:
+                f.write(text)
         full_markdown_content.append(text)
-        generated_chapters_data.append({"filename": fname, "content": text, "name": current_chapter_name})
+        generated_chapters_data.append({"filename": fname, "content": text, "name": name})
             
     return "\n\n".join(full_markdown_content), generated_chapters_data
 
-def fast_extract_pdf(pdf_path: str, job_id: str) -> tuple[str, list]:
-    """Extract PDF using Docling and split into chapters"""
-    converter = init_ocr()
-    start_time = time.time()
-    
+def convert_pdf(pdf_path: str, job_id: str) -> list:
+    """Run Docling on the PDF and return the converted DoclingDocuments in page order."""
     print(f"📄 Processing {pdf_path} with Docling...")
     write_job(job_id, {"status": "running", "progress": 10})
 
+    # Plan conversion: which pages need OCR, and whether to split across the pool
+    if ADAPTIVE_OCR:
+        needs_ocr = scan_text_layer(pdf_path)
+        num_pages = len(needs_ocr)
+        segments = ocr_segments(needs_ocr)
+    else:
+        num_pages = count_pdf_pages(pdf_path) if OCR_WORKERS > 0 else 0
+        segments = [(1, num_pages, True)] if num_pages else []
+
+    pages_ocr = sum(end - start + 1 for start, end, do_ocr in segments if do_ocr)
+    pages_text = sum(end - start + 1 for start, end, do_ocr in segments if not do_ocr)
+    if segments:
+        print(f"🔎 {pages_text} pages use the text layer, {pages_ocr} pages need OCR")
+    # Per job, so batches and dashboards can see how much OCR was skipped
+    write_job(job_id, {"pages_text_layer": pages_text, "pages_ocr": pages_ocr})
+
     # Run conversion
-    result = converter.convert(pdf_path)
+    if OCR_WORKERS > 0 and num_pages >= OCR_PARALLEL_MIN_PAGES:
+        documents = convert_parallel(pdf_path, segments, job_id)
+    elif len(segments) <= 1:
+        do_ocr = segments[0][2] if segments else True
+        documents = [init_ocr(do_ocr).convert(pdf_path).document]
+    else:
+        documents = [
+            init_ocr(do_ocr).convert(pdf_path, page_range=(start, end)).document
+            for start, end, do_ocr in segments
+        ]
     write_job(job_id, {"status": "running", "progress": 50})
-    
-    # Prepare output directory
-    output_dir = Path(f"extracted_chapters_{job_id}")
-    if output_dir.exists():
-        shutil.rmtree(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Export chapters
-    full_markdown, files_data = export_chapters_final(result, output_dir)
-    
+    return documents
+
+def stream_extract_pdf(pdf_path: str, job_id: str):
+    """
+    Convert the PDF now and return a generator of chapter entries
+    ({"type", "chapter_index", "filename", "content"}) produced lazily,
+    so downstream stages can start on the first chapter.
+    """
+    start_time = time.time()
+    documents = convert_pdf(pdf_path, job_id)
+    print(f"⚡ Converted in {time.time() - start_time:.1f}s")
+
+    def generate():
+        archived = []
+        for index, (name, text) in enumerate(iter_chapters(documents)):
+            fname = chapter_filename(index, name)
+            if CHAPTER_ARCHIVE_DIR:
+                archived.append((fname, text))
+            yield {
+                "type": "chapter",
+                "chapter_index": index + 1,
+                "filename": fname,
+                "content": text
+            }
+        if CHAPTER_ARCHIVE_DIR:
+            archive_dir = Path(CHAPTER_ARCHIVE_DIR)
+            archive_dir.mkdir(parents=True, exist_ok=True)
+            zip_output(archived, archive_dir / f"{job_id}.zip")
+            print(f"Archived {len(archived)} chapters to {archive_dir / f'{job_id}.zip'}")
+    return generate()
+
+def fast_extract_pdf(pdf_path: str, job_id: str) -> tuple[str, list]:
+    """Extract PDF using Docling and split into chapters"""
+    start_time = time.time()
+    json_pages = list(stream_extract_pdf(pdf_path, job_id))
+    full_markdown = "\n\n".join(p["content"] for p in json_pages)
+
     elapsed = time.time() - start_time
     print(f"⚡ Processed in {elapsed:.1f}s")
     
-    write_job(job_id, {"status": "running", "progress": 100})
+    write_job(job_id, {"status": "running", "progress": 60})
     
     # Return full markdown and list of generated chapter files with content
-    json_pages = [
-        {
-            "type": "chapter", 
-            "chapter_index": i+1, 
-            "filename": d['filename'], 
-            "content": d['content']
-        } 
-        for i, d in enumerate(files_data)
-    ]
-    
     return full_markdown, json_pages
 
-def zip_output(output_dir: Path, zip_path: Path):
-    """Zip results"""
+def zip_output(source: Path | Iterable[tuple[str, str]], zip_path: Path):
+    """Zip results: a directory, or (filename, text) pairs written straight from memory"""
     with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-        for file in output_dir.rglob("*"):
-            if file.is_file():
-                z.write(file, file.relative_to(output_dir))
-
+        if isinstance(source, Path):
+            for file in source.rglob("*"):
+                if file.is_file():
+                    z.write(file, file.relative_to(source))
+        else:
+            for filename, text in source:
+                z.writestr(filename, text)
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from config import QUERY_CACHE_SIZE, QUERY_CACHE_TTL, RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL, CACHE_DIR
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate):
+        """Drop every entry whose key matches predicate. Returns the number removed."""
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+# normalized question -> query vector
+QUERY_VECTOR_CACHE = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+# (vector hash, scope, k, with_vectors, mode, text, index generation) -> retrieved points
+RETRIEVAL_CACHE = LRUCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+
+# Touched whenever stored vectors change (ingest, delete, re-index swap); its mtime is
+# part of every retrieval key, so each process on the host stops serving results
+# from before the change, not just the process that made it
+INDEX_GENERATION_PATH = os.path.join(CACHE_DIR, "index_generation")
+
+def index_generation() -> int:
+    try:
+        return os.stat(INDEX_GENERATION_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def bump_index_generation():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Set explicitly: two changes within the filesystem's timestamp granularity still differ
+    generation = max(time.time_ns(), index_generation() + 1)
+    with open(INDEX_GENERATION_PATH, "w") as f:
+        f.write(str(generation))
+    os.utime(INDEX_GENERATION_PATH, ns=(generation, generation))
+    RETRIEVAL_CACHE.clear()
+
+def normalize_question(question: str) -> str:
+    # The embedding model is uncased, so case and spacing don't change the vector
+    return " ".join(question.lower().split())
+
+def vector_key(vector) -> str:
+    import numpy as np
+    return hashlib.sha1(np.asarray(vector, dtype=np.float32).tobytes()).hexdigest()
+
+def get_query_vector(question: str):
+    from services.embedding_service import embed_chunks
+    key = normalize_question(question)
+    vector = QUERY_VECTOR_CACHE.get(key)
+    if vector is None:
+        vector = embed_chunks([question])[0]
+        vector.flags.writeable = False
+        QUERY_VECTOR_CACHE.put(key, vector)
+    return vector
+
+def cached_search(query_vector, k=4, document_id=None, with_vectors=False, mode="dense", query_text=None,
+                  document_ids=None, user_id=None):
+    from services.vector_service import search
+    from db.vector_store import scope_documents
+    # Sparse scores depend on the text, not just its vector
+    text_key = normalize_question(query_text) if mode == "hybrid" and query_text else None
+    documents = scope_documents(document_id, document_ids)
+    scope = (user_id, tuple(sorted(documents)) if documents else None)
+    key = (vector_key(query_vector), scope, k, with_vectors, mode, text_key, index_generation())
+    points = RETRIEVAL_CACHE.get(key)
+    if points is None:
+        points = search(
+            query_vector, k=k, with_vectors=with_vectors, mode=mode, query_text=query_text,
+            document_ids=documents, user_id=user_id
+        )
+        RETRIEVAL_CACHE.put(key, points)
+    return points
+
+def invalidate_document(document_id: str):
+    """
+    Called when a document's vectors changed. Cached results may include it in any
+    process, so the index generation moves on and every process misses from now on.
+    Query vectors don't depend on documents and are kept.
+    """
+    bump_index_generation()
+
+def cache_stats():
+    return {
+        "query_vectors": QUERY_VECTOR_CACHE.stats(),
+        "retrieval": RETRIEVAL_CACHE.stats()
+    }
@@ -1,15 +1,5 @@
-from config import GEMINI_API_KEY
-
-_gemini_model = None
-
-def get_gemini_model():
-    global _gemini_model
-    if _gemini_model is None:
-        import google.generativeai as genai
-        print("🔄 Initializing Gemini AI...")
-        genai.configure(api_key=GEMINI_API_KEY)
-        _gemini_model = genai.GenerativeModel("gemini-1.5-flash") # Using 1.5-flash as default stable choice
-    return _gemini_model
+from config import LLM_RETRY_BACKOFF_SECONDS, RETRIEVAL_MODE
+from services.llm_service import get_llm_provider
 
 def detect_mode(question: str) -> str:
     """
@@ -73,29 +63,41 @@ Question:
 
 Answer:"""
 
-def build_rag_context(question, document_id=None):
-    from services.embedding_service import embed_chunks
-    from services.vector_service import search
+class ScopeError(Exception):
+    """Raised for a question scoped to neither a user's library nor any document."""
+    pass
+
+def check_scope(document_id=None, user_id=None, document_ids=None):
+    """Refuse unscoped retrieval: it would search every user's documents."""
+    if not (user_id or document_id or document_ids):
+        raise ScopeError("A question needs a user_id, document_id or document_ids")
+
+def build_rag_context(question, document_id=None, retrieval_mode=None, user_id=None, document_ids=None):
+    """
+    Retrieve, assemble and format the prompt. Retrieval is scoped to document_id,
+    or to document_ids, within user_id's library when given.
+    """
+    from services.query_cache import get_query_vector, cached_search
+    from services.context_service import assemble_context, CANDIDATES
     
-    q_vec = embed_chunks([question])[0]
-    results = search(q_vec, document_id=document_id)
+    check_scope(document_id, user_id, document_ids)
+    mode = detect_mode(question)
+    q_vec = get_query_vector(question)
+    # Over-fetch with vectors, then diversify and pack to the mode's token budget
+    results = cached_search(
+        q_vec, k=CANDIDATES[mode], document_id=document_id, with_vectors=True,
+        mode=retrieval_mode or RETRIEVAL_MODE, query_text=question,
+        document_ids=document_ids, user_id=user_id
+    )
+    retrieved_chunks = assemble_context(results, mode=mode)
     
-    retrieved_chunks = []
     sources = []
-    for r in results:
-        payload = getattr(r, 'payload', {}) or {}
-        text = payload.get("text", "")
-        chunk_obj = {
-            "id": getattr(r, 'id', 'unknown'),
-            "score": getattr(r, 'score', 0.0),
-            "content": text,
-            "metadata": {k:v for k,v in payload.items() if k != "text"}
-        }
-        retrieved_chunks.append(chunk_obj)
+    for c in retrieved_chunks:
+        meta = c["metadata"]
         source = {
-            "page": payload.get("page"),
-            "chapter": payload.get("chapter"),
-            "section": payload.get("section")
+            "page": meta.get("page"),
+            "chapter": meta.get("chapter"),
+            "section": meta.get("section")
         }
         if source not in sources:
             sources.append(source)
@@ -111,7 +113,6 @@ def build_rag_context(question, document_id=None):
     if not context_str.strip():
         context_str = "No relevant content found in document."
     
-    mode = detect_mode(question)
     try:
         if mode == "summary":
             prompt = SUMMARY_PROMPT_TEMPLATE.format(retrieved_context=context_str, user_question=question)
@@ -126,26 +127,88 @@ def build_rag_context(question, document_id=None):
         "sources": sources
     }
 
-def answer_question(question, document_id=None):
+def generate_text(prompt):
+    """
+    Call the LLM, retrying with backoff on rate limits.
+    Raises google.api_core.exceptions.ResourceExhausted once retries run out.
+    """
     import time
     from google.api_core import exceptions
     
-    rag_data = build_rag_context(question, document_id=document_id)
-    model = get_gemini_model()
+    provider = get_llm_provider()
     
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            response = model.generate_content(rag_data["prompt"])
-            return response.text
+            return provider.generate(prompt)
         except exceptions.ResourceExhausted:
             if attempt < max_retries - 1:
-                sleep_time = (attempt + 1) * 2
+                sleep_time = (attempt + 1) * LLM_RETRY_BACKOFF_SECONDS
                 time.sleep(sleep_time)
             else:
-                return "### ⚠️ Rate Limit Reached\n\nYou have hit the free tier limit for the AI model. Please wait a minute before trying again."
-        except Exception as e:
-             raise e
+                raise
     return "Failed to generate answer."
 
+RATE_LIMIT_MESSAGE = "### ⚠️ Rate Limit Reached\n\nYou have hit the free tier limit for the AI model. Please wait a minute before trying again."
+
+def answer_question(question, document_id=None, retrieval_mode=None, user_id=None, document_ids=None):
+    from google.api_core import exceptions
+    
+    rag_data = build_rag_context(
+        question, document_id=document_id, retrieval_mode=retrieval_mode, user_id=user_id, document_ids=document_ids
+    )
+    try:
+        return generate_text(rag_data["prompt"])
+    except exceptions.ResourceExhausted:
+        return RATE_LIMIT_MESSAGE
+
+async def generate_text_stream(prompt):
+    """
+    Async streaming LLM call: yields text pieces as they arrive.
+    Rate limits are retried with non-blocking backoff until the first piece is sent.
+    """
+    import asyncio
+    from google.api_core import exceptions
+
+    provider = get_llm_provider()
 
+    max_retries = 3
+    for attempt in range(max_retries):
+        started = False
+        try:
+            async for text in provider.stream(prompt):
+                started = True
+                yield text
+            return
+        except exceptions.ResourceExhausted:
+            if started or attempt >= max_retries - 1:
+                raise
+            await asyncio.sleep((attempt + 1) * LLM_RETRY_BACKOFF_SECONDS)
+
+async def stream_answer(question, document_id=None, retrieval_mode=None, user_id=None, document_ids=None):
+    """
+    Async RAG answer, streamed. Retrieval runs in a worker thread.
+    A rate limit raises ResourceExhausted, possibly after some pieces were sent.
+    """
+    import asyncio
+
+    rag_data = await asyncio.to_thread(
+        build_rag_context, question, document_id=document_id, retrieval_mode=retrieval_mode,
+        user_id=user_id, document_ids=document_ids
+    )
+    async for piece in generate_text_stream(rag_data["prompt"]):
+        yield piece
+
+async def answer_question_async(question, document_id=None, retrieval_mode=None, user_id=None, document_ids=None):
+    from google.api_core import exceptions
+
+    parts = []
+    try:
+        async for piece in stream_answer(
+            question, document_id=document_id, retrieval_mode=retrieval_mode, user_id=user_id, document_ids=document_ids
+        ):
+            parts.append(piece)
+    except exceptions.ResourceExhausted:
+        # A cut-off answer is not returned as if it were complete
+        return RATE_LIMIT_MESSAGE
+    return "".join(parts) or "Failed to generate answer."
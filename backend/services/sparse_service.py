@@ -0,0 +1,50 @@
+import re
+import zlib
+from collections import Counter
+from config import BM25_K1, BM25_B, BM25_AVG_DOC_LEN
+from services.chunk_service import STOP_WORDS
+
+# Lexical (BM25) sparse vectors for hybrid retrieval.
+# Term ids are stable hashes, so no vocabulary has to be stored; Qdrant
+# applies IDF on its side (sparse vector modifier), we supply the BM25 TF part.
+
+# Words, numbers and codes like "E-1023", "v2.4" or "part_no"
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+SPLIT_RE = re.compile(r"[-_.]")
+
+def tokenize(text: str) -> list:
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        terms.append(token)
+        # Index the parts of compound codes too, so "E-1023" also matches "1023"
+        if SPLIT_RE.search(token):
+            terms.extend(p for p in SPLIT_RE.split(token) if p and p not in STOP_WORDS)
+    return terms
+
+def term_id(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+def _to_sparse(weights: dict):
+    from qdrant_client import models
+    # Hash collisions merge into one index
+    merged = {}
+    for term, weight in weights.items():
+        idx = term_id(term)
+        merged[idx] = merged.get(idx, 0.0) + weight
+    indices = sorted(merged)
+    return models.SparseVector(indices=indices, values=[merged[i] for i in indices])
+
+def encode_document(text: str, keywords=()):
+    """BM25 term weights for a chunk; extracted keywords count as an extra occurrence."""
+    terms = tokenize(text)
+    counts = Counter(terms)
+    for kw in keywords:
+        for term in tokenize(kw):
+            counts[term] += 1
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * len(terms) / BM25_AVG_DOC_LEN)
+    return _to_sparse({t: tf * (BM25_K1 + 1) / (tf + norm) for t, tf in counts.items()})
+
+def encode_query(text: str):
+    return _to_sparse({t: 1.0 for t in set(tokenize(text))})
@@ -0,0 +1,174 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import SUMMARY_GROUP_CHARS
+
+# Hierarchical document summaries, computed once per document and stored
+# in the Supabase "summaries" table, with an in-process copy in front.
+
+CHAPTER_SUMMARY_PROMPT = """Summarize the following part of a document in 5–8 bullet points.
+Keep names, numbers and key terms. Mention page numbers where given.
+No emojis. No introduction.
+
+Text:
+{text}
+
+Summary:"""
+
+MERGE_PROMPT_TEMPLATE = """You are an assistant that summarizes documents.
+Below are summaries of consecutive parts of one document, in order.
+Combine them into a single summary of the whole document.
+
+Format the answer in clean Markdown using this structure:
+
+## Summary
+(2–3 short sentences)
+
+## Key Concepts
+- Bullet points only
+
+## Architecture / Details
+- Bullet points
+
+## Conclusion
+(1 short paragraph)
+
+Rules:
+- Use simple language.
+- No emojis.
+- No inline sources.
+- No markdown inside sentences.
+- Use blank lines between sections.
+
+Part summaries:
+{part_summaries}
+
+Answer:"""
+
+_summaries = {}
+_locks = {}
+_locks_guard = threading.Lock()
+_executor = None
+
+def _doc_lock(document_id: str):
+    with _locks_guard:
+        return _locks.setdefault(document_id, threading.Lock())
+
+def document_sections(document_id: str) -> list:
+    """
+    Chapter texts of a document in order: from the content cache when
+    available, otherwise rebuilt from the chunks stored in the vector DB.
+    """
+    from services import content_cache
+    from services.vector_service import scroll_document_chunks
+
+    chapters = content_cache.chapters_for_document(document_id)
+    if chapters:
+        return [c["content"] for c in chapters if c.get("content")]
+
+    by_page = {}
+    for point in scroll_document_chunks(document_id):
+        payload = point.payload or {}
+        by_page.setdefault(payload.get("page") or 0, []).append(payload.get("text", ""))
+    return ["\n\n".join(texts) for _, texts in sorted(by_page.items())]
+
+def split_section(text: str, max_chars: int = SUMMARY_GROUP_CHARS) -> list:
+    """Cut a section into pieces of up to max_chars, at paragraph, line or word breaks when possible."""
+    pieces = []
+    while len(text) > max_chars:
+        window = text[:max_chars + 1]
+        for separator in ("\n\n", "\n", " "):
+            cut = window.rfind(separator)
+            if cut > 0:
+                break
+        else:
+            cut = max_chars
+        pieces.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+def group_sections(sections: list, max_chars: int = SUMMARY_GROUP_CHARS) -> list:
+    """Pack consecutive sections into groups of up to max_chars (long sections span several groups)."""
+    separator = "\n\n"
+    groups = []
+    current = []
+    size = 0
+    for section in sections:
+        for text in split_section(section, max_chars):
+            # Joining adds a separator before every part but the first
+            added = len(text) + (len(separator) if current else 0)
+            if current and size + added > max_chars:
+                groups.append(separator.join(current))
+                current, size = [], 0
+                added = len(text)
+            current.append(text)
+            size += added
+    if current:
+        groups.append(separator.join(current))
+    return groups
+
+def build_summary(document_id: str) -> str:
+    """Map: summarize each group of chapters. Reduce: merge into one document summary."""
+    from services.rag_service import generate_text
+
+    groups = group_sections(document_sections(document_id))
+    if not groups:
+        return "No content found for this document."
+
+    print(f"📝 Summarizing document {document_id} from {len(groups)} part(s)...")
+    part_summaries = [generate_text(CHAPTER_SUMMARY_PROMPT.format(text=g)) for g in groups]
+    joined = "\n\n".join(f"Part {i + 1}:\n{s}" for i, s in enumerate(part_summaries))
+    return generate_text(MERGE_PROMPT_TEMPLATE.format(part_summaries=joined))
+
+def _load(document_id: str):
+    from pipelines.pdf_pipeline import get_supabase
+    res = get_supabase().table("summaries").select("summary").eq("document_id", document_id).limit(1).execute()
+    return res.data[0]["summary"] if res.data else None
+
+def _store(document_id: str, summary: str):
+    from pipelines.pdf_pipeline import get_supabase
+    get_supabase().table("summaries").upsert({"document_id": document_id, "summary": summary}).execute()
+
+def get_document_summary(document_id: str) -> str:
+    """Serve the stored summary, building it on first request."""
+    summary = _summaries.get(document_id)
+    if summary is not None:
+        return summary
+
+    with _doc_lock(document_id):
+        summary = _summaries.get(document_id)
+        if summary is None:
+            try:
+                summary = _load(document_id)
+            except Exception as e:
+                print(f"Failed to load stored summary: {e}")
+        if summary is None:
+            summary = build_summary(document_id)
+            try:
+                _store(document_id, summary)
+            except Exception as e:
+                print(f"Failed to store summary: {e}")
+        _summaries[document_id] = summary
+    return summary
+
+def precompute_summary(document_id: str):
+    """Build the summary in the background after ingest."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+
+    def _run():
+        try:
+            get_document_summary(document_id)
+        except Exception as e:
+            print(f"Summary precompute failed for {document_id}: {e}")
+    _executor.submit(_run)
+
+def invalidate_summary(document_id: str):
+    _summaries.pop(document_id, None)
+    try:
+        from pipelines.pdf_pipeline import get_supabase
+        get_supabase().table("summaries").delete().eq("document_id", document_id).execute()
+    except Exception as e:
+        print(f"Failed to delete stored summary: {e}")
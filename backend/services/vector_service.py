@@ -4,13 +4,40 @@ import os
 # Add the backend directory to sys.path so we can import from db and services
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from db.vector_client import get_vector_client, COLLECTION
+import hashlib
+import uuid
+from db.vector_store import get_vector_store
 from services.embedding_service import embed_chunks
+from services.query_cache import invalidate_document
 
-def store_embeddings(chunks_data, vectors):
-    client = get_vector_client()
+# Namespace for deterministic point ids
+POINT_NAMESPACE = uuid.UUID("6f1c1d52-3b0e-4a4e-9a52-1f5d0c8e7b21")
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+def point_id(document_id, chunk_index, text_hash) -> str:
+    """Stable point id from (document, chunk ordinal, content); re-ingesting the same data hits the same ids."""
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{document_id}:{chunk_index}:{text_hash}"))
+
+def chunk_point_id(chunk) -> str:
+    metadata = chunk.get("metadata", {})
+    return point_id(
+        metadata.get("document_id"),
+        metadata.get("chunk_index", chunk.get("id", "")),
+        content_hash(chunk.get("content", ""))
+    )
+
+def store_embeddings(chunks_data, vectors, store=None, skip_existing=False):
+    """
+    Write chunks to the live store, or to store (a re-index shadow) when given.
+    skip_existing leaves points already stored untouched instead of rewriting them.
+    """
+    live = store is None
+    store = store or get_vector_store()
     # chunks_data is expected to be [{"id":..., "content":..., "metadata":...}, ...]
     payloads = []
+    ids = []
     for chunk in chunks_data:
         # Flatten metadata and content into one payload
         payload = {
@@ -18,39 +45,44 @@ def store_embeddings(chunks_data, vectors):
             "chunk_id": chunk.get("id", ""),
             **chunk.get("metadata", {})
         }
+        payload["content_hash"] = content_hash(payload["text"])
         payloads.append(payload)
-        
-    client.upload_collection(
-        collection_name=COLLECTION,
-        vectors=vectors,
-        payload=payloads
+        ids.append(chunk_point_id(chunk))
+
+    written = store.upsert(ids, vectors, payloads, skip_existing=skip_existing)
+    if written and live:
+        for document_id in {p.get("document_id") for p in payloads if p.get("document_id")}:
+            invalidate_document(document_id)
+    print(f"embeddings stored Successfully ({written} written, {len(ids) - written} already stored)")
+
+
+def store_keywords(chunks_data):
+    """Write the keywords of chunks already stored by store_embeddings (set by assign_keywords afterwards)."""
+    store = get_vector_store()
+    store.set_keywords(
+        [chunk_point_id(chunk) for chunk in chunks_data],
+        [chunk.get("content", "") for chunk in chunks_data],
+        [chunk["metadata"].get("keywords", []) for chunk in chunks_data]
     )
-    print("embeddings stored Successfully")
-
-
-def search(query_vector, k=4, document_id=None):
-    from qdrant_client import models
-    client = get_vector_client()
-    query_filter = None
-    if document_id:
-        query_filter = models.Filter(
-            must=[
-                models.FieldCondition(
-                    key="document_id",
-                    match=models.MatchValue(value=document_id)
-                )
-            ]
-        )
+    for document_id in {chunk["metadata"].get("document_id") for chunk in chunks_data} - {None}:
+        invalidate_document(document_id)
+
 
+def search(query_vector, k=4, document_id=None, with_vectors=False, mode="dense", query_text=None,
+           document_ids=None, user_id=None):
+    """
+    Nearest chunks to query_vector, optionally scoped to one document, a list of
+    documents and/or one user's library.
+    mode="hybrid" (needs query_text) also runs a BM25 sparse query and fuses both
+    rankings with reciprocal rank fusion, where the backend supports it.
+    """
+    store = get_vector_store()
     try:
-        # Using query_points (Universal Query) as client.search seems unavailable
-        result = client.query_points(
-            collection_name=COLLECTION,
-            query=query_vector,
-            query_filter=query_filter,
-            limit=k
+        return store.search(
+            query_vector, k=k, document_id=document_id,
+            with_vectors=with_vectors, mode=mode, query_text=query_text,
+            document_ids=document_ids, user_id=user_id
         )
-        return result.points
     except Exception as e:
         print(f"VECTOR SEARCH FAILED: {e}")
         # Log detailed cloud error if available
@@ -59,24 +91,17 @@ def search(query_vector, k=4, document_id=None):
         raise e
 
 
+def scroll_document_chunks(document_id, with_vectors=False):
+    """Yield every stored point of a document (payload, plus the dense vector if asked)."""
+    yield from get_vector_store().scroll_document(document_id, with_vectors=with_vectors)
+
+
 def delete_vectors_by_doc_id(document_id):
     """Delete all vectors associated with a document ID."""
-    from qdrant_client import models
-    client = get_vector_client()
+    store = get_vector_store()
     try:
-        client.delete(
-            collection_name=COLLECTION,
-            points_selector=models.FilterSelector(
-                filter=models.Filter(
-                    must=[
-                        models.FieldCondition(
-                            key="document_id",
-                            match=models.MatchValue(value=document_id)
-                        )
-                    ]
-                )
-            )
-        )
+        store.delete_document(document_id)
+        invalidate_document(document_id)
         print(f"Vectors for document {document_id} deleted successfully.")
     except Exception as e:
         print(f"Error deleting vectors for {document_id}: {e}")
@@ -97,3 +97,40 @@ using ( bucket_id = 'documents' );
 create policy "Allow public delete"
 on storage.objects for delete
 using ( bucket_id = 'documents' );
+
+
+-- ==========================================
+-- 4. SUMMARIES TABLE
+-- ==========================================
+
+-- One cached summary per indexed document (keyed by job_id / Qdrant document_id)
+create table if not exists summaries (
+  document_id text primary key,
+  summary text,
+  created_at timestamptz default now()
+);
+
+alter table summaries enable row level security;
+
+drop policy if exists "Allow public select" on summaries;
+drop policy if exists "Allow public insert" on summaries;
+drop policy if exists "Allow public update" on summaries;
+drop policy if exists "Allow public delete" on summaries;
+
+-- PERMISSIVE POLICIES (the backend upserts summaries and deletes them with their document)
+create policy "Allow public select"
+  on summaries for select
+  using (true);
+
+create policy "Allow public insert"
+  on summaries for insert
+  with check (true);
+
+create policy "Allow public update"
+  on summaries for update
+  using (true)
+  with check (true);
+
+create policy "Allow public delete"
+  on summaries for delete
+  using (true);
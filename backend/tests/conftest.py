@@ -0,0 +1,15 @@
+import sys
+import os
+
+# Tests import backend modules the way the app does (from backend/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    from services import embedding_service
+    from tokenizer_fixture import build_tokenizer
+    tokenizer = build_tokenizer()
+    monkeypatch.setattr(embedding_service, "_tokenizer", tokenizer)
+    return tokenizer
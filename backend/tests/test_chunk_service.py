@@ -0,0 +1,93 @@
+import json
+import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from services import chunk_service
+from services.chunk_service import (
+    CHUNK_BUDGET, CHUNK_PARALLEL_MIN_PAGES, assign_keywords, chunk_document, iter_hierarchy_and_chunks
+)
+from services.context_service import merge_adjacent
+from tokenizer_fixture import WORDS, install_tokenizer
+
+def paragraph(rng, lines=3, words=8):
+    return "\n".join(
+        " ".join(f"{rng.choice(WORDS)}{rng.randint(0, 60)}" for _ in range(words)) for _ in range(lines)
+    )
+
+def fixture_pages(count, seed=0):
+    """Docling-style chapters; some start with a chapter or section header, some continue the previous one."""
+    rng = random.Random(seed)
+    pages = []
+    for index in range(1, count + 1):
+        roll = rng.random()
+        head = f"# Chapter {index}\n\n" if roll < 0.2 else (f"## {index}.1 Section\n\n" if roll < 0.5 else "")
+        body = "\n\n".join(paragraph(rng, lines=rng.randint(1, 6)) for _ in range(rng.randint(1, 12)))
+        pages.append({"chapter_index": index, "content": head + body})
+    return pages
+
+def test_paragraph_and_line_breaks_are_kept(tokenizer):
+    first, second = "pump1 valve2\nsensor3 order4", "battery5 layer6"
+    pages = [
+        {"chapter_index": 1, "content": f"# Chapter 1\n\n{first}\n\n\n{second}"},
+        {"chapter_index": 2, "content": "## 1.1 Setup\nmodel7 safety8"},
+    ]
+    hierarchy = []
+    chunks = list(iter_hierarchy_and_chunks(pages, hierarchy))
+    assert [c["content"] for c in chunks] == [f"# Chapter 1\n\n{first}\n\n{second}", "## 1.1 Setup\n\nmodel7 safety8"]
+    assert [(c["metadata"]["chapter"], c["metadata"]["section"]) for c in chunks] == [("Chapter 1", ""), ("Chapter 1", "1.1 Setup")]
+    assert hierarchy == [{"page": 1, "chapter": "Chapter 1"}, {"page": 2, "chapter": "Chapter 1", "section": "1.1 Setup"}]
+
+def test_chunks_fit_the_budget_and_overlaps_stitch_back(tokenizer):
+    rng = random.Random(1)
+    # One paragraph far over budget (split between words, with overlap), then short paragraphs
+    text = paragraph(rng, lines=120, words=10) + "\n\n" + "\n\n".join(paragraph(rng, lines=2) for _ in range(30))
+    chunks = list(iter_hierarchy_and_chunks([{"chapter_index": 1, "content": text}]))
+    assert len(chunks) > 3
+    for c in chunks:
+        assert len(tokenizer(c["content"], add_special_tokens=False)["input_ids"]) <= CHUNK_BUDGET
+    assert any(c["metadata"]["overlap_chars"] for c in chunks)
+
+    for index, c in enumerate(chunks):
+        c["metadata"].update(chunk_index=index, document_id="doc")
+        c["score"] = 0.0
+    merged = merge_adjacent(chunks)
+    assert len(merged) == 1
+    assert merged[0]["content"] == text
+
+def test_keywords_rank_distinctive_words_first():
+    chunks = [
+        {"content": "Valve valve valve pressure pump and the of", "metadata": {}},
+        {"content": "Sensor sensor battery pump", "metadata": {}},
+        {"content": "Invoice order pump pump pump", "metadata": {}},
+    ]
+    assign_keywords(chunks, top_n=3)
+    assert [c["metadata"]["keywords"] for c in chunks] == [
+        ["Valve", "Pressure", "Pump"],
+        ["Sensor", "Battery", "Pump"],
+        # Common to every chunk, but three times as frequent here: 1 + ln 3 outweighs idf
+        ["Pump", "Invoice", "Order"],
+    ]
+
+def test_keywords_ignore_stop_words_and_short_words():
+    chunks = [{"content": "an ox is by the pump", "metadata": {}}, {"content": "1234 !!", "metadata": {}}]
+    assign_keywords(chunks)
+    assert [c["metadata"]["keywords"] for c in chunks] == [["Pump"], []]
+
+@pytest.fixture
+def chunk_pool(monkeypatch):
+    pool = ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("spawn"), initializer=install_tokenizer
+    )
+    monkeypatch.setattr(chunk_service, "_CHUNK_POOL", pool)
+    yield pool
+    pool.shutdown()
+
+def test_parallel_chunking_matches_serial(tokenizer, chunk_pool):
+    pages = fixture_pages(max(CHUNK_PARALLEL_MIN_PAGES, 120))
+    serial_hierarchy, parallel_hierarchy = [], []
+    serial = chunk_document(pages, serial_hierarchy, workers=0)
+    parallel = chunk_document(pages, parallel_hierarchy, workers=2)
+    assert len(chunk_service.plan_tasks(pages, 8)) > 1
+    assert json.dumps(parallel) == json.dumps(serial)
+    assert parallel_hierarchy == serial_hierarchy
@@ -0,0 +1,80 @@
+import multiprocessing
+import numpy as np
+from db.local_vector_store import LocalVectorStore
+
+DIM = 8
+BATCHES = 20
+BATCH = 25
+
+def expected_vector(writer, i):
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[writer] = 1.0
+    vector[4 + i % 4] = (i + 1) / 100
+    return vector / np.linalg.norm(vector)
+
+def write_points(path, writer):
+    store = LocalVectorStore(path, dim=DIM)
+    for b in range(BATCHES):
+        indexes = range(b * BATCH, (b + 1) * BATCH)
+        store.upsert(
+            [f"{writer}-{i}" for i in indexes],
+            np.stack([expected_vector(writer, i) for i in indexes]),
+            [{"document_id": f"doc-{writer}", "user_id": "u", "i": i} for i in indexes]
+        )
+
+def test_concurrent_writers_get_distinct_rows(tmp_path):
+    path = str(tmp_path / "store")
+    LocalVectorStore(path, dim=DIM)
+    context = multiprocessing.get_context("spawn")
+    writers = [context.Process(target=write_points, args=(path, w)) for w in range(2)]
+    for p in writers:
+        p.start()
+    for p in writers:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+
+    store = LocalVectorStore(path, dim=DIM)
+    assert store.document_ids() == ["doc-0", "doc-1"]
+    for writer in range(2):
+        points = list(store.scroll_document(f"doc-{writer}", with_vectors=True))
+        assert sorted(p.payload["i"] for p in points) == list(range(BATCHES * BATCH))
+        for p in points:
+            np.testing.assert_allclose(p.vector, expected_vector(writer, p.payload["i"]), atol=1e-6)
+
+def test_upsert_skips_stored_ids(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"), dim=DIM)
+    payload = {"document_id": "doc", "user_id": "u", "i": 0}
+    assert store.upsert(["a"], [expected_vector(0, 0)], [payload]) == 1
+    assert store.upsert(["a", "b"], [expected_vector(0, 0), expected_vector(0, 1)], [payload, payload],
+                        skip_existing=True) == 1
+    results = store.search(expected_vector(0, 1), k=1, user_id="u")
+    assert results[0].payload == payload and abs(results[0].score - 1.0) < 1e-5
+
+def test_upsert_replaces_stored_ids(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"), dim=DIM)
+    store.upsert(["a"], [expected_vector(0, 0)], [{"document_id": "doc", "user_id": "u", "keywords": []}])
+    refreshed = {"document_id": "doc", "user_id": "u", "keywords": ["pump"]}
+    assert store.upsert(["a"], [expected_vector(0, 0)], [refreshed]) == 1
+    assert [p.payload for p in store.search(expected_vector(0, 0), k=5, user_id="u")] == [refreshed]
+    assert [p.payload for p in LocalVectorStore(str(tmp_path / "store"), dim=DIM).scroll_document("doc")] == [refreshed]
+
+def test_scoping_keeps_legacy_points_of_named_documents(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"), dim=DIM)
+    store.upsert(
+        ["legacy", "mine", "theirs"],
+        [expected_vector(0, i) for i in range(3)],
+        [{"document_id": "old"}, {"document_id": "new", "user_id": "u"}, {"document_id": "other", "user_id": "v"}]
+    )
+    query = expected_vector(0, 0)
+    assert {p.payload["document_id"] for p in store.search(query, k=5, user_id="u")} == {"new"}
+    assert {p.payload["document_id"] for p in store.search(query, k=5, user_id="u", document_ids=["old", "new", "other"])} == {"old", "new"}
+
+def test_set_keywords_keeps_vectors_and_payload(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"), dim=DIM)
+    store.upsert(["a", "b"], [expected_vector(0, 0), expected_vector(0, 1)],
+                 [{"document_id": "doc", "user_id": "u", "keywords": [], "i": i} for i in range(2)])
+    store.set_keywords(["a"], ["pump text"], [["Pump"]])
+    points = {p.payload["i"]: p for p in store.scroll_document("doc", with_vectors=True)}
+    assert points[0].payload == {"document_id": "doc", "user_id": "u", "keywords": ["Pump"], "i": 0}
+    assert points[1].payload["keywords"] == []
+    np.testing.assert_allclose(points[0].vector, expected_vector(0, 0), atol=1e-6)
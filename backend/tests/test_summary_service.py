@@ -0,0 +1,20 @@
+from services.summary_service import group_sections, split_section
+
+def test_long_section_is_split_not_truncated():
+    paragraphs = [f"Paragraph {i} " + "word " * 40 for i in range(200)]
+    section = "\n\n".join(paragraphs)
+    groups = group_sections(["Intro", section, "Outro"], max_chars=2000)
+    assert all(len(g) <= 2000 for g in groups)
+    joined = " ".join(" ".join(groups).split())
+    for paragraph in paragraphs:
+        assert " ".join(paragraph.split()) in joined
+    assert groups[0].startswith("Intro") and groups[-1].endswith("Outro")
+
+def test_split_without_breaks_cuts_hard():
+    assert split_section("x" * 25, max_chars=10) == ["x" * 10, "x" * 10, "x" * 5]
+
+def test_short_sections_are_packed():
+    assert group_sections(["a" * 4, "b" * 4, "c" * 4], max_chars=10) == ["aaaa\n\nbbbb", "cccc"]
+
+def test_separators_count_against_the_limit():
+    assert group_sections(["a" * 4, "b" * 6], max_chars=10) == ["aaaa", "bbbbbb"]
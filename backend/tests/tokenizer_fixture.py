@@ -0,0 +1,27 @@
+# A small word-piece tokenizer with a fixed vocabulary, standing in for the embedding
+# model's (no download). Words outside WORDS split into letter and digit pieces.
+
+import string
+
+WORDS = ["pump", "sensor", "invoice", "model", "layer", "valve", "safety", "order", "pressure", "battery"]
+
+def vocabulary():
+    pieces = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    symbols = string.ascii_lowercase + string.digits
+    pieces += list(symbols) + [f"##{s}" for s in symbols] + list(string.punctuation)
+    pieces += WORDS + [f"##{d}{e}" for d in string.digits for e in string.digits]
+    return {piece: i for i, piece in enumerate(pieces)}
+
+def build_tokenizer():
+    from tokenizers import BertWordPieceTokenizer
+    from transformers import PreTrainedTokenizerFast
+    tokenizer = BertWordPieceTokenizer(vocabulary(), lowercase=True)
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer._tokenizer, unk_token="[UNK]", cls_token="[CLS]", sep_token="[SEP]", pad_token="[PAD]"
+    )
+
+def install_tokenizer():
+    """Make embedding_service.get_tokenizer() return the fixture tokenizer (also a pool initializer)."""
+    from services import embedding_service
+    embedding_service._tokenizer = build_tokenizer()
+    return embedding_service._tokenizer
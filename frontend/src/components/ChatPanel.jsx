@@ -64,8 +64,24 @@ const ChatPanel = ({ currentDocumentId, userId }) => {
       textareaRef.current.style.height = '50px';
     }
 
+    const entryId = Date.now();
+    const updateAnswer = (answer) => {
+      setChatHistory(prev => prev.map(item => item.id === entryId ? { ...item, answer } : item));
+    };
+
+    setChatHistory(prev => [
+      ...prev,
+      {
+        id: entryId,
+        question: userQuestion,
+        answer: '',
+        sourceChunks: []
+      }
+    ]);
+
+    let answer = '';
     try {
-      const response = await fetch(`${API_BASE_URL}/api/query`, {
+      const response = await fetch(`${API_BASE_URL}/api/query/stream`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -75,21 +91,45 @@ const ChatPanel = ({ currentDocumentId, userId }) => {
         })
       });
 
-      if (!response.ok) throw new Error('Network response was not ok');
-      const data = await response.json();
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(typeof body.detail === 'string' ? body.detail : 'Network response was not ok');
+      }
 
-      setChatHistory(prev => [
-        ...prev,
-        {
-          id: Date.now(),
-          question: userQuestion,
-          answer: data.answer,
-          sourceChunks: []
+      // Read server-sent events: "data: {token}" pieces, then "event: done" or "event: error"
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let finished = false;
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const lines = raw.split('\n');
+          const eventType = lines.find(l => l.startsWith('event: '))?.slice(7) || 'message';
+          const dataLine = lines.find(l => l.startsWith('data: '));
+          if (!dataLine) continue;
+          const data = JSON.parse(dataLine.slice(6));
+          if (eventType === 'error') {
+            // Keep what already arrived and show the server's message below it
+            answer = answer ? `${answer}\n\n---\n\n${data.detail}` : data.detail;
+            updateAnswer(answer);
+            await reader.cancel();
+            finished = true;
+            break;
+          }
+          answer = eventType === 'done' ? data.answer : answer + data.token;
+          updateAnswer(answer);
         }
-      ]);
+      }
 
     } catch (error) {
       console.error('Error fetching answer:', error);
+      const message = `### ⚠️ Something went wrong\n\n${error.message}`;
+      updateAnswer(answer ? `${answer}\n\n---\n\n${message}` : message);
     } finally {
       setLoading(false);
     }
@@ -3,6 +3,9 @@ import './UploadPanel.css';
 
 import { API_BASE_URL } from '../api/config';
 
+// Give up polling an ingest job after this long (the backend fails jobs cut off by a restart)
+const MAX_POLL_MS = 30 * 60 * 1000;
+
 const UploadPanel = ({ onUploadSuccess, userId }) => {
   const [file, setFile] = useState(null);
   const [uploadProgress, setUploadProgress] = useState(0);
@@ -59,31 +62,32 @@ const UploadPanel = ({ onUploadSuccess, userId }) => {
     formData.append("user_id", userId);
 
     try {
-      // UX Fake Progress
-      const progressInterval = setInterval(() => {
-        setUploadProgress(prev => {
-          if (prev >= 90) return prev;
-          return prev + 10;
-        });
-      }, 500);
-
       const response = await fetch(`${API_BASE_URL}/api/documents/upload`, {
         method: 'POST',
         body: formData,
       });
 
-
       const data = await response.json();
-      clearInterval(progressInterval);
 
-      if (response.ok) {
+      if (!response.ok) {
+        const reason = response.status === 429
+          ? 'Server is busy processing other documents. Please try again shortly.'
+          : (data.detail || 'Unknown error');
+        alert(`Upload failed: ${reason}`);
+        setUploadProgress(0);
+        return;
+      }
+
+      // Poll the ingestion job until it finishes
+      const job = await pollJob(data.job_id);
+      if (job.status === 'completed') {
         setUploadProgress(100);
         setUploadSuccess(true);
-        if (onUploadSuccess && data.document_id) {
-          onUploadSuccess(data.document_id);
+        if (onUploadSuccess && job.document_id) {
+          onUploadSuccess(job.document_id);
         }
       } else {
-        alert(`Upload failed: ${data.detail || 'Unknown error'}`);
+        alert(`Upload failed: ${job.error || 'Unknown error'}`);
         setUploadProgress(0);
       }
     } catch (error) {
@@ -93,6 +97,25 @@ const UploadPanel = ({ onUploadSuccess, userId }) => {
     }
   };
 
+  const pollJob = async (jobId) => {
+    const deadline = Date.now() + MAX_POLL_MS;
+    while (true) {
+      if (Date.now() > deadline) {
+        return { status: 'failed', error: 'Processing is taking too long. Check the document list later.' };
+      }
+      await new Promise(resolve => setTimeout(resolve, 1500));
+      const res = await fetch(`${API_BASE_URL}/api/documents/jobs/${jobId}`);
+      const job = await res.json();
+      if (!res.ok) {
+        return { status: 'failed', error: job.detail };
+      }
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job;
+      }
+      setUploadProgress(Math.max(10, Math.min(job.progress || 0, 99)));
+    }
+  };
+
   const isProcessing = uploadProgress > 0 && uploadProgress < 100;
 
   return (